@@ -0,0 +1,632 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2026 Ethan Furman
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+benchmarks against an in-process stand-in for an OpenERP server
+
+    python -m openerplib.bench --sizes 100 1000 --output results.json
+    python -m openerplib.bench --baseline results.json
+
+FakeServer speaks XML-RPC and JSON-RPC and serves fields_get, search, read,
+search_read, create, write (and the few calls Model itself makes) from
+synthetic records, with an optional delay per request
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+from . import dates
+from .main import get_connection, pfm, RpcMetrics
+from .utils import CSV, Query, QueryDomain, get_records
+
+try:
+    from xmlrpclib import Fault, dumps, loads
+except ImportError:
+    from xmlrpc.client import Fault, dumps, loads
+
+try:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+except ImportError:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+
+_timer = getattr(time, 'perf_counter', time.time)
+
+
+# the fake server
+
+PARTNER_FIELDS = {
+        'name': {'type': 'char', 'string': 'Name', 'size': 128},
+        'email': {'type': 'char', 'string': 'Email', 'size': 240},
+        'comment': {'type': 'text', 'string': 'Notes'},
+        'active': {'type': 'boolean', 'string': 'Active'},
+        'credit': {'type': 'float', 'string': 'Credit'},
+        'employees': {'type': 'integer', 'string': 'Employees'},
+        'birthdate': {'type': 'date', 'string': 'Birthdate'},
+        'write_date': {'type': 'datetime', 'string': 'Last Updated'},
+        'state': {
+            'type': 'selection', 'string': 'State',
+            'selection': [('draft', 'Draft'), ('open', 'Open'), ('done', 'Done')],
+            },
+        'parent_id': {'type': 'many2one', 'string': 'Parent', 'relation': 'res.partner'},
+        'child_ids': {
+            'type': 'one2many', 'string': 'Contacts',
+            'relation': 'res.partner', 'relation_field': 'parent_id',
+            },
+        'category_ids': {'type': 'many2many', 'string': 'Tags', 'relation': 'res.partner.category'},
+        }
+
+CATEGORY_FIELDS = {
+        'name': {'type': 'char', 'string': 'Name', 'size': 64},
+        }
+
+_IMD_FIELDS = {
+        'module': {'type': 'char', 'string': 'Module', 'size': 64},
+        'name': {'type': 'char', 'string': 'External ID', 'size': 128},
+        'model': {'type': 'char', 'string': 'Model', 'size': 64},
+        'res_id': {'type': 'integer', 'string': 'Record ID'},
+        }
+
+_USER_FIELDS = {
+        'name': {'type': 'char', 'string': 'Name', 'size': 128},
+        'login': {'type': 'char', 'string': 'Login', 'size': 64},
+        }
+
+class FakeData(object):
+    """
+    synthetic records for res.partner (`rows` of them) and res.partner.category,
+    plus the minimal ir.model.data and res.users the library itself touches
+
+    records are kept as the server would send them: many2one as [id, name],
+    x2many as lists of ids, dates and datetimes as strings
+    """
+
+    def __init__(self, rows=1000, seed=42):
+        rnd = random.Random(seed)
+        self.fields = {
+                'res.partner': PARTNER_FIELDS,
+                'res.partner.category': CATEGORY_FIELDS,
+                'ir.model.data': _IMD_FIELDS,
+                'res.users': _USER_FIELDS,
+                }
+        self.tables = dict((model, {}) for model in self.fields)
+        self.next_id = dict((model, 1) for model in self.fields)
+        self.lock = threading.Lock()
+        self._reverse = {}
+        for i in range(20):
+            self.add('res.partner.category', {'name': 'Category %d' % i})
+        self.add('res.users', {'name': 'Administrator', 'login': 'admin'})
+        start = datetime(2010, 1, 1)
+        for i in range(rows):
+            parent = rnd.randint(1, i) if i and rnd.random() < 0.5 else False
+            self.add('res.partner', {
+                    'name': 'Partner %d' % (i + 1),
+                    'email': 'partner%d@example.com' % (i + 1),
+                    'comment': 'a comment of moderate length ' * rnd.randint(0, 5),
+                    'active': rnd.random() < 0.9,
+                    'credit': round(rnd.uniform(0, 10000), 2),
+                    'employees': rnd.randint(0, 500),
+                    'birthdate': (start.date() + timedelta(days=rnd.randint(0, 9000))).strftime('%Y-%m-%d'),
+                    'write_date': (start + timedelta(seconds=rnd.randint(0, 400000000))).strftime('%Y-%m-%d %H:%M:%S'),
+                    'state': rnd.choice(['draft', 'open', 'done']),
+                    'parent_id': parent,
+                    'category_ids': sorted(rnd.sample(range(1, 21), rnd.randint(0, 4))),
+                    })
+
+    def add(self, model, values):
+        with self.lock:
+            id = self.next_id[model]
+            self.next_id[model] += 1
+            record = dict((f, False) for f in self.fields[model])
+            record.update(values)
+            record['id'] = id
+            self.tables[model][id] = record
+            self._reverse.clear()
+        return id
+
+    def write(self, model, ids, values):
+        with self.lock:
+            for id in ids:
+                self.tables[model][id].update(values)
+            self._reverse.clear()
+
+    def unlink(self, model, ids):
+        with self.lock:
+            for id in ids:
+                self.tables[model].pop(id, None)
+            self._reverse.clear()
+
+    def get(self, model, id, field):
+        "value of `field` as the server would send it"
+        definition = self.fields[model][field]
+        value = self.tables[model][id][field]
+        kind = definition['type']
+        if kind == 'many2one':
+            if value:
+                return [value, self.tables[definition['relation']][value].get('name') or '']
+            return False
+        elif kind == 'one2many':
+            return list(self._children(definition['relation'], definition['relation_field']).get(id, ()))
+        elif kind == 'many2many':
+            return list(value or [])
+        return value
+
+    def _children(self, model, field):
+        "{parent id: [ids]} for the many2one `field` of `model`"
+        key = model, field
+        with self.lock:
+            children = self._reverse.get(key)
+            if children is None:
+                children = self._reverse[key] = {}
+                for id in sorted(self.tables[model]):
+                    parent = self.tables[model][id][field]
+                    if parent:
+                        children.setdefault(parent, []).append(id)
+        return children
+
+
+class FakeServer(object):
+    """
+    serves FakeData over XML-RPC (/xmlrpc/common, /xmlrpc/object) and
+    JSON-RPC (/jsonrpc) on a background thread; `latency` seconds are added
+    to every request
+
+    use as a context manager, or call start() and stop()
+    """
+
+    def __init__(self, data=None, latency=0.0, host='127.0.0.1', port=0):
+        self.data = data if data is not None else FakeData()
+        self.latency = latency
+        self.requests = 0
+        self._server = _ThreadingHTTPServer((host, port), _Handler)
+        self._server.fake = self
+        self.host, self.port = self._server.server_address[:2]
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def connect(self, protocol='xmlrpc', **kwds):
+        "a Connection to this server"
+        return get_connection(
+                self.host, protocol, self.port, database='bench', login='admin', password='admin',
+                **kwds
+                )
+
+    def dispatch(self, service, method, args):
+        self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if service == 'common':
+            if method == 'login':
+                return 1
+            elif method == 'version':
+                return {'server_version': '7.0'}
+        elif service == 'object' and method == 'execute_kw':
+            database, user_id, password, model, method = args[:5]
+            kwds = dict(args[6]) if len(args) > 6 else {}
+            args = list(args[5]) if len(args) > 5 else []
+            return self.execute(model, method, args, kwds)
+        raise ValueError('unsupported call: %s.%s' % (service, method))
+
+    def execute(self, model, method, args, kwds):
+        data = self.data
+        if model not in data.fields:
+            raise ValueError("Object %s doesn't exist" % model)
+        kwds.pop('context', None)
+        if method == 'model_info':
+            return {'_auto': True, '_transient': False, '_rec_name': 'name'}
+        elif method == 'fields_get':
+            allfields = (args or [None])[0] or kwds.get('allfields')
+            fields = data.fields[model]
+            return dict(
+                    (name, dict(definition))
+                    for name, definition in fields.items()
+                    if not allfields or name in allfields
+                    )
+        elif method == 'default_get':
+            return {}
+        elif method in ('search', 'search_count', 'search_read'):
+            names = ['domain', 'fields', 'offset', 'limit', 'order']
+            if method != 'search_read':
+                names.remove('fields')
+            params = dict(zip(names, args))
+            params.update(kwds)
+            if 'args' in params:
+                # search()'s name for the domain
+                params['domain'] = params.pop('args')
+            ids = self.search(model, params.get('domain') or [], params.get('offset') or 0, params.get('limit'))
+            if method == 'search':
+                return ids
+            elif method == 'search_count':
+                return len(ids)
+            return self.read(model, ids, params.get('fields'))
+        elif method == 'read':
+            ids = args[0] if args else kwds['ids']
+            fields = args[1] if len(args) > 1 else kwds.get('fields')
+            if isinstance(ids, int):
+                return self.read(model, [ids], fields)[0]
+            return self.read(model, ids, fields)
+        elif method == 'create':
+            values = args[0] if args else kwds['values']
+            return data.add(model, self._written(model, values))
+        elif method == 'write':
+            ids = args[0] if args else kwds['ids']
+            values = args[1] if len(args) > 1 else kwds['values']
+            if isinstance(ids, int):
+                ids = [ids]
+            data.write(model, ids, self._written(model, values))
+            return True
+        elif method == 'unlink':
+            ids = args[0] if args else kwds['ids']
+            if isinstance(ids, int):
+                ids = [ids]
+            data.unlink(model, ids)
+            return True
+        raise ValueError('method %r not supported on %r' % (method, model))
+
+    def search(self, model, domain, offset=0, limit=None):
+        records = self.data.tables[model]
+        ids = sorted(id for id, record in records.items() if _matches(record, domain))
+        return ids[offset:offset+limit if limit else None]
+
+    def read(self, model, ids, fields=None):
+        data = self.data
+        fields = fields or list(data.fields[model])
+        records = []
+        for id in ids:
+            if id not in data.tables[model]:
+                continue
+            record = dict((f, data.get(model, id, f)) for f in fields if f != 'id')
+            record['id'] = id
+            records.append(record)
+        return records
+
+    def _written(self, model, values):
+        "apply x2many commands and drop unknown fields"
+        fields = self.data.fields[model]
+        result = {}
+        for name, value in values.items():
+            if name not in fields:
+                continue
+            if fields[name]['type'] in ('one2many', 'many2many'):
+                ids = []
+                for command in value or []:
+                    if command[0] == 4:
+                        ids.append(command[1])
+                    elif command[0] == 6:
+                        ids = list(command[2])
+                value = ids
+            result[name] = value
+        return result
+
+def _matches(record, domain):
+    "evaluate a (prefix notation) OpenERP domain against a raw record"
+    stack = []
+    for term in reversed(domain):
+        if term == '!':
+            stack.append(not stack.pop())
+        elif term == '&':
+            stack.append(stack.pop() & stack.pop())
+        elif term == '|':
+            stack.append(stack.pop() | stack.pop())
+        else:
+            field, op, value = term
+            if isinstance(field, int):
+                actual = field
+            else:
+                actual = record.get(field)
+            stack.append(_compare(actual, op, value))
+    return all(stack)
+
+def _compare(actual, op, value):
+    if isinstance(actual, list):
+        # x2many fields match if any of their ids do
+        return any(_compare(a, op, value) for a in actual) if actual else _compare(False, op, value)
+    if op in ('=', '=='):
+        return actual == value
+    elif op in ('!=', '<>'):
+        return actual != value
+    elif op == 'in':
+        return actual in value
+    elif op == 'not in':
+        return actual not in value
+    elif op in ('like', 'ilike'):
+        actual, value = actual or '', value or ''
+        if op == 'ilike':
+            actual, value = actual.lower(), value.lower()
+        return value in actual
+    elif op == '<':
+        return actual < value
+    elif op == '<=':
+        return actual <= value
+    elif op == '>':
+        return actual > value
+    elif op == '>=':
+        return actual >= value
+    raise ValueError('unsupported domain operator: %r' % (op, ))
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+class _Handler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        fake = self.server.fake
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        if self.path == '/jsonrpc':
+            request = json.loads(body.decode('utf-8'))
+            params = request['params']
+            try:
+                result = {'result': fake.dispatch(params['service'], params['method'], params.get('args', []))}
+            except Exception as exc:
+                result = {'error': {
+                        'code': 200,
+                        'message': str(exc),
+                        'data': {'debug': traceback.format_exc()},
+                        }}
+            result.update({'jsonrpc': '2.0', 'id': request.get('id')})
+            response = json.dumps(result).encode('utf-8')
+            content_type = 'application/json'
+        elif self.path.startswith('/xmlrpc/'):
+            args, method = loads(body)
+            try:
+                result = dumps((fake.dispatch(self.path[8:], method, args), ), methodresponse=True, allow_none=True)
+            except Exception:
+                result = dumps(Fault(1, traceback.format_exc()), allow_none=True)
+            response = result.encode('utf-8')
+            content_type = 'text/xml'
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def log_message(self, format, *args):
+        pass
+
+
+# the benchmarks
+
+class Benchmarks(object):
+    """
+    times library operations at each of `sizes` against a FakeServer, for
+    each of `protocols`
+
+    each result is a dict of benchmark, protocol (None if no server is
+    involved), size, repeat, best and median (seconds), and per_item
+    (best / size, in microseconds)
+    """
+
+    names = (
+            'model.read', 'get_records', 'query.nested',
+            'pfm', 'csv.write', 'csv.read', 'dates.parse', 'dates.format',
+            )
+
+    def __init__(self, sizes=(100, 1000), protocols=('xmlrpc', 'jsonrpc'), repeat=3, latency=0.0, only=None):
+        self.sizes = sorted(sizes)
+        self.protocols = protocols
+        self.repeat = repeat
+        self.latency = latency
+        self.only = only or self.names
+        self.results = []
+
+    def run(self):
+        with FakeServer(FakeData(rows=self.sizes[-1]), latency=self.latency) as server:
+            for protocol in self.protocols:
+                connection = server.connect(protocol)
+                partners = connection.get_model('res.partner')
+                # warm up the connection and the library's caches
+                partners.read(partners.search([], limit=10))
+                for size in self.sizes:
+                    ids = partners.search([], limit=size)
+                    if 'model.read' in self.only:
+                        self._time('model.read', protocol, size, partners.read, ids, fields=sorted(PARTNER_FIELDS))
+                        self._post_processing(connection, protocol, size, ids)
+                    if 'get_records' in self.only:
+                        self._time(
+                                'get_records', protocol, size,
+                                get_records, partners, domain=[('id', 'in', ids)], fields=sorted(PARTNER_FIELDS),
+                                )
+                    if 'query.nested' in self.only:
+                        self._time('query.nested', protocol, size, self._query, partners, ids)
+        records = self._records(self.sizes[-1])
+        workspace = tempfile.mkdtemp()
+        try:
+            for size in self.sizes:
+                sample = records[:size]
+                if 'pfm' in self.only:
+                    self._time('pfm', None, size, pfm, sample)
+                filename = os.path.join(workspace, '%d.csv' % size)
+                if 'csv.write' in self.only:
+                    self._time('csv.write', None, size, self._write_csv, filename, sample)
+                elif 'csv.read' in self.only:
+                    self._write_csv(filename, sample)
+                if 'csv.read' in self.only:
+                    self._time('csv.read', None, size, lambda: list(CSV(filename)))
+                strings = [r['write_date'] for r in self._raw(size)]
+                if 'dates.parse' in self.only:
+                    self._time('dates.parse', None, size, dates.str_to_datetime_many, strings)
+                if 'dates.format' in self.only:
+                    moments = dates.str_to_datetime_many(strings)
+                    self._time('dates.format', None, size, dates.local_to_utc_str_many, moments)
+        finally:
+            shutil.rmtree(workspace)
+        return self.results
+
+    def report(self):
+        "the results, with enough about the environment to compare runs"
+        return {
+                'python': platform.python_version(),
+                'implementation': platform.python_implementation(),
+                'platform': platform.platform(),
+                'latency': self.latency,
+                'results': self.results,
+                }
+
+    def _time(self, name, protocol, size, func, *args, **kwds):
+        times = []
+        for _ in range(self.repeat):
+            start = _timer()
+            func(*args, **kwds)
+            times.append(_timer() - start)
+        self._add(name, protocol, size, times)
+
+    def _add(self, name, protocol, size, times):
+        times = sorted(times)
+        self.results.append({
+                'benchmark': name,
+                'protocol': protocol,
+                'size': size,
+                'repeat': len(times),
+                'best': times[0],
+                'median': times[len(times) // 2],
+                'per_item': times[0] / size * 1e6,
+                })
+
+    def _post_processing(self, connection, protocol, size, ids):
+        "time spent converting Model.read results, without the round trip"
+        metrics = connection.metrics = RpcMetrics()
+        partners = connection.get_model('res.partner')
+        times = []
+        for _ in range(self.repeat):
+            metrics.reset()
+            partners.read(ids, fields=sorted(PARTNER_FIELDS))
+            times.append(metrics.stats['res.partner', 'read']['post'])
+        connection.metrics = None
+        self._add('model.read.post', protocol, size, times)
+
+    def _query(self, model, ids):
+        # Query changes its fields list, and would otherwise answer from the cache
+        QueryDomain._cache.clear()
+        return Query(model, ids=ids, fields=['name', 'parent_id/name', 'parent_id/email', 'category_ids/name'])
+
+    def _raw(self, size):
+        data = FakeData(rows=size)
+        return [data.tables['res.partner'][id] for id in sorted(data.tables['res.partner'])]
+
+    def _records(self, size):
+        "records as a script would hand them to the library"
+        records = []
+        for raw in self._raw(size):
+            record = dict(raw)
+            record['birthdate'] = dates.str_to_date(raw['birthdate'])
+            record['write_date'] = dates.str_to_datetime(raw['write_date'])
+            record['comment'] = record['comment'] or 'none'
+            del record['parent_id'], record['category_ids']
+            records.append(record)
+        return records
+
+    def _write_csv(self, filename, records):
+        header = sorted(records[0])
+        with CSV(filename, 'w', stream=True, validate=False) as csv:
+            csv.header = header
+            for record in records:
+                csv.append([record[name] for name in header])
+
+
+def compare(baseline, current, threshold=0.25):
+    """
+    benchmarks in `current` whose best time is more than `threshold` (a
+    fraction) slower than in `baseline`, as (benchmark, protocol, size, old, new)
+    """
+    old = dict(
+            ((r['benchmark'], r['protocol'], r['size']), r['best'])
+            for r in baseline['results']
+            )
+    slower = []
+    for result in current['results']:
+        key = result['benchmark'], result['protocol'], result['size']
+        if key in old and result['best'] > old[key] * (1 + threshold):
+            slower.append(key + (old[key], result['best']))
+    return slower
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='benchmark the library against a local fake server')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000], help='record counts')
+    parser.add_argument('--protocols', nargs='+', default=['xmlrpc', 'jsonrpc'], choices=['xmlrpc', 'jsonrpc'])
+    parser.add_argument('--only', nargs='+', choices=Benchmarks.names, help='benchmarks to run (default: all)')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per benchmark (the best is reported)')
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to each server request')
+    parser.add_argument('--output', help='file for the json results (default: stdout)')
+    parser.add_argument('--baseline', help='earlier json results; exit 1 if any benchmark is slower')
+    parser.add_argument('--threshold', type=float, default=0.25, help='fraction slower that counts as a regression')
+    args = parser.parse_args(argv)
+    benchmarks = Benchmarks(args.sizes, args.protocols, args.repeat, args.latency, args.only)
+    benchmarks.run()
+    report = benchmarks.report()
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=1, sort_keys=True)
+    else:
+        json.dump(report, sys.stdout, indent=1, sort_keys=True)
+        print()
+    if args.baseline:
+        with open(args.baseline) as baseline:
+            slower = compare(json.load(baseline), report, args.threshold)
+        for benchmark, protocol, size, old, new in slower:
+            print(
+                    '%s [%s] size %d: %.4fs -> %.4fs' % (benchmark, protocol or '-', size, old, new),
+                    file=sys.stderr,
+                    )
+        if slower:
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
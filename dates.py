@@ -28,9 +28,10 @@
 #
 ##############################################################################
 
+from bisect import bisect_right
 from dbf import Date, DateTime, Time
 from time import timezone as system_timezone
-from datetime import date, datetime, time
+from datetime import date, datetime, time, timedelta
 from pytz import timezone, utc as UTC
 
 """
@@ -64,6 +65,88 @@ if system_timezone:
 else:
     EFF_TIME = UTC
 
+class ZoneWindows(object):
+    """
+    converts naive UTC datetimes to `zone`, remembering the offset window
+    (the span between two transitions) of the last conversion
+    """
+
+    def __init__(self, zone):
+        self.zone = zone
+        # pytz zones with daylight saving list their transitions; fixed-offset
+        # zones (including UTC) have one window that covers everything
+        self.transitions = getattr(zone, '_utc_transition_times', None)
+        if self.transitions:
+            self._window = self._find(self.transitions[-1])
+        else:
+            self._window = datetime.min, datetime.max, zone.utcoffset(datetime(2000, 1, 1)), zone
+
+    def from_utc(self, dt):
+        "naive UTC datetime -> aware `zone` datetime"
+        start, end, offset, tzinfo = self._window
+        if not start <= dt < end:
+            start, end, offset, tzinfo = self._window = self._find(dt)
+        return (dt + offset).replace(tzinfo=tzinfo)
+
+    def to_utc(self, dt):
+        "naive `zone` datetime -> naive UTC datetime (ambiguous times as localize() does)"
+        start, end, offset, tzinfo = self._window
+        utc = dt - offset
+        if not start + _ONE_DAY <= utc < end - _ONE_DAY:
+            # too close to a transition to be sure, so let pytz decide
+            zone = self.zone
+            utc = zone.normalize(zone.localize(dt)).astimezone(UTC).replace(tzinfo=None)
+            self._window = self._find(utc)
+        return utc
+
+    def _find(self, dt):
+        "(start, end, offset, tzinfo) of the window holding `dt`"
+        zone = self.zone
+        transitions = self.transitions
+        i = max(bisect_right(transitions, dt) - 1, 0)
+        info = zone._transition_info[i]
+        return (
+                transitions[i] if i else datetime.min,
+                transitions[i+1] if i+1 < len(transitions) else datetime.max,
+                info[0],
+                zone._tzinfos[info],
+                )
+
+_ONE_DAY = timedelta(days=1)
+_zone_windows = {}
+
+def _local_windows():
+    "ZoneWindows for the current LOCAL_TIME (which may be changed after import)"
+    zone = LOCAL_TIME
+    windows = _zone_windows.get(zone)
+    if windows is None:
+        windows = _zone_windows[zone] = ZoneWindows(zone)
+    return windows
+
+def _parse_date(string):
+    "'2011-12-01' -> date; raises ValueError if not a date"
+    if len(string) == 10 and string[4] == '-' and string[7] == '-':
+        return date(int(string[:4]), int(string[5:7]), int(string[8:]))
+    return datetime.strptime(string, DEFAULT_SERVER_DATE_FORMAT).date()
+
+def _parse_time(string):
+    "'15:12:35[.123]' -> time; raises ValueError if not a time"
+    if len(string) >= 8 and string[2] == ':' and string[5] == ':' and (len(string) == 8 or string[8] == '.'):
+        return time(int(string[:2]), int(string[3:5]), int(string[6:8]))
+    return datetime.strptime(string.split(".")[0], DEFAULT_SERVER_TIME_FORMAT).time()
+
+def _parse_datetime(string):
+    "'2011-12-01 15:12:35[.123]' -> naive datetime; raises ValueError if not a datetime"
+    if (
+            len(string) >= 19 and string[4] == '-' and string[7] == '-' and string[10] == ' '
+            and string[13] == ':' and string[16] == ':' and (len(string) == 19 or string[19] == '.')
+        ):
+        return datetime(
+                int(string[:4]), int(string[5:7]), int(string[8:10]),
+                int(string[11:13]), int(string[14:16]), int(string[17:19]),
+                )
+    return datetime.strptime(string.split(".")[0], DEFAULT_SERVER_DATETIME_FORMAT)
+
 def str_to_datetime(string, localtime=True):
     """
     Converts a UTC string to a datetime object using OpenERP's
@@ -74,11 +157,10 @@ def str_to_datetime(string, localtime=True):
     """
     if not string:
         return False
-    dt = datetime.strptime(string.split(".")[0], DEFAULT_SERVER_DATETIME_FORMAT)
-    dt = UTC.localize(dt)
+    dt = _parse_datetime(string)
     if localtime:
-        dt = dt.astimezone(LOCAL_TIME)
-    return DateTime(dt)
+        return DateTime(_local_windows().from_utc(dt))
+    return DateTime(dt.replace(tzinfo=UTC))
 
 def str_to_date(string):
     """
@@ -87,7 +169,7 @@ def str_to_date(string):
     """
     if not string:
         return False
-    return Date.strptime(string, DEFAULT_SERVER_DATE_FORMAT)
+    return Date(_parse_date(string))
 
 def str_to_time(string, localtime=True):
     """
@@ -99,13 +181,34 @@ def str_to_time(string, localtime=True):
     """
     if not string:
         return False
-    t = time.strptime(string.split(".")[0], DEFAULT_SERVER_TIME_FORMAT)
-    dt = UTC.localize(datetime.combine(date.today(), t))
+    t = _parse_time(string)
     if localtime:
-        dt = dt.astimezone(LOCAL_TIME)
-    t = dt.time()
+        t = _local_windows().from_utc(datetime.combine(date.today(), t)).time()
     return Time(t)
 
+def str_to_datetime_many(strings, localtime=True):
+    """
+    str_to_datetime() for a column of strings; returns a list
+    """
+    parse = _parse_datetime
+    if localtime:
+        from_utc = _local_windows().from_utc
+        return [DateTime(from_utc(parse(s))) if s else False for s in strings]
+    return [DateTime(parse(s).replace(tzinfo=UTC)) if s else False for s in strings]
+
+def str_to_date_many(strings):
+    """
+    str_to_date() for a column of strings; returns a list
+    """
+    parse = _parse_date
+    return [Date(parse(s)) if s else False for s in strings]
+
+def str_to_time_many(strings, localtime=True):
+    """
+    str_to_time() for a column of strings; returns a list
+    """
+    return [str_to_time(s, localtime) for s in strings]
+
 def datetime_to_str(dt):
     """
     Converts a datetime object to a string using OpenERP's
@@ -120,6 +223,28 @@ def datetime_to_str(dt):
         dt = dt.astimezone(UTC)
     return dt.strftime(DEFAULT_SERVER_DATETIME_FORMAT)
 
+def local_to_utc_str(dt):
+    """
+    Converts a datetime object to a UTC string using OpenERP's
+    datetime string format; same as local_to_utc(dt).strftime(...)
+    (naive datetimes are in LOCAL_TIME).
+    """
+    if isinstance(dt, DateTime):
+        dt = dt._datetime
+        if dt is None:
+            return False
+    if dt.tzinfo is None:
+        dt = _local_windows().to_utc(dt)
+    else:
+        dt = dt.replace(tzinfo=None) - dt.utcoffset()
+    return '%04d-%02d-%02d %02d:%02d:%02d' % (dt.year, dt.month, dt.day, dt.hour, dt.minute, dt.second)
+
+def local_to_utc_str_many(datetimes):
+    """
+    local_to_utc_str() for a column of datetimes; returns a list
+    """
+    return [local_to_utc_str(dt) for dt in datetimes]
+
 def date_to_str(d):
     """
     Converts a date object to a string using OpenERP's
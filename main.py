@@ -36,9 +36,11 @@ Code repository: https://code.launchpad.net/~niv-openerp/openerp-client-lib/trun
 """
 from __future__ import print_function
 try:
-    from xmlrpclib import Fault, ServerProxy
+    from xmlrpclib import Fault, ServerProxy, Transport, SafeTransport
+    from xmlrpclib import Binary as _XmlBinary, DateTime as _XmlDateTime
 except ImportError:
-    from xmlrpc.client import Fault, ServerProxy
+    from xmlrpc.client import Fault, ServerProxy, Transport, SafeTransport
+    from xmlrpc.client import Binary as _XmlBinary, DateTime as _XmlDateTime
 
 try:
     from urllib2 import Request, urlopen
@@ -46,20 +48,30 @@ except ImportError:
     from urllib.request import Request, urlopen
 
 try:
-    import __builtin__ as builtins
+    from Queue import Queue, Empty, Full
 except ImportError:
-    import builtins
+    from queue import Queue, Empty, Full
 
+import ast
+import gzip
 import logging
+import os
 import random
 import re
+import sys
+import threading
+import time
 from aenum import Enum, NamedTuple
-from base64 import b64decode
-from .dates import local_to_utc, UTC
+from base64 import b64decode, b64encode
+from bisect import bisect_left
+from collections import deque
+from operator import attrgetter
+from .dates import local_to_utc, local_to_utc_str, local_to_utc_str_many, UTC
+from .dates import str_to_date_many, str_to_datetime_many, _parse_date, _parse_datetime
 from datetime import date, datetime
-from dbf import Date, DateTime
+from dbf import Date, DateTime, Table, READ_WRITE
 from .utils import AttrDict, IDEquality, Many2One, XidRec, Phone, Binary, SelectionEnum
-from scription import bytes, integer as baseinteger, basestring, number, str, Var, raise_exc
+from scription import bytes, integer as baseinteger, basestring, number, str, raise_exc
 from VSS.address import PostalCode
 
 try:
@@ -67,20 +79,124 @@ try:
 except ImportError:
     import simplejson as json
 
+try:
+    from reprlib import Repr
+except ImportError:
+    from repr import Repr
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
 DEFAULT_SERVER_DATE_FORMAT = "%Y-%m-%d"
 DEFAULT_SERVER_TIME_FORMAT = "%H:%M:%S"
 DEFAULT_SERVER_DATETIME_FORMAT = "%s %s" % (
     DEFAULT_SERVER_DATE_FORMAT,
     DEFAULT_SERVER_TIME_FORMAT)
 
-python_exc = Var(lambda hay: re.search(r"\\n(ValueError|KeyError): *(.*)\\n'>", hay))
-oe_exc = Var(lambda hay: re.search(r"(AccessDenied|AccessError|MissingError|ValidationError|ConstraintError): (.*)\\n'>", hay))
-
 _logger = logging.getLogger(__name__)
 
 def _getChildLogger(logger, subname):
     return logging.getLogger(logger.name + "." + subname)
 
+class _BriefRepr(Repr):
+    "size-bounded repr that also reports how long shortened containers were"
+
+    def __init__(self, maxlength):
+        Repr.__init__(self)
+        self.maxlevel = 3
+        self.maxlist = self.maxtuple = self.maxset = self.maxdict = 10
+        self.maxstring = self.maxother = 60
+        self.maxlength = maxlength
+
+    def repr(self, value):
+        text = Repr.repr(self, value)
+        if len(text) > self.maxlength:
+            text = text[:self.maxlength-3] + '...'
+        return text
+
+    def _counted(self, text, value, limit):
+        # count first, so the final truncation cannot remove it
+        if len(value) > limit:
+            text = '<%d items> %s' % (len(value), text)
+        return text
+
+    def repr_list(self, value, level):
+        return self._counted(Repr.repr_list(self, value, level), value, self.maxlist)
+
+    def repr_tuple(self, value, level):
+        return self._counted(Repr.repr_tuple(self, value, level), value, self.maxtuple)
+
+    def repr_dict(self, value, level):
+        return self._counted(Repr.repr_dict(self, value, level), value, self.maxdict)
+
+    def repr_AttrDict(self, value, level):
+        # AttrDict's own repr formats everything
+        if not value:
+            return 'AttrDict()'
+        if level <= 0:
+            return 'AttrDict(...)'
+        keys = value.keys()
+        pieces = [
+                '%s=%s' % (k, self.repr1(value[k], level-1))
+                for k in keys[:self.maxdict]
+                ]
+        if len(keys) > self.maxdict:
+            pieces.append('...')
+        return self._counted('AttrDict(%s)' % ', '.join(pieces), keys, self.maxdict)
+
+
+class DebugLog(object):
+    """
+    how much of each call's arguments and results go to the debug log
+
+    arguments and results are logged as truncated reprs (at most `maxlength`
+    characters), along with result counts and call times; a `sample` fraction
+    of calls also has its complete payload logged to the `payload` child logger
+    """
+
+    def __init__(self, maxlength=500, sample=0.0):
+        self._repr = _BriefRepr(maxlength)
+        self.sample = sample
+
+    @property
+    def maxlength(self):
+        return self._repr.maxlength
+
+    @maxlength.setter
+    def maxlength(self, maxlength):
+        self._repr.maxlength = maxlength
+
+    def brief(self, value):
+        "size-bounded repr of `value`, only computed if the record is emitted"
+        return _Brief(self._repr, value)
+
+    def capture(self):
+        "True if this call's complete payload should be logged"
+        return self.sample > 0 and random.random() < self.sample
+
+class _Brief(object):
+    __slots__ = ('repr', 'value')
+
+    def __init__(self, repr, value):
+        self.repr = repr
+        self.value = value
+
+    def __str__(self):
+        return self.repr.repr(self.value)
+
+def _count(result):
+    "'n records' for lists and tuples, the type name otherwise"
+    if isinstance(result, (list, tuple)):
+        return '%d records' % len(result)
+    return type(result).__name__
+
+debug_log = DebugLog()
+_payload_logger = _getChildLogger(_logger, 'payload')
+
 class Connector(object):
     """
     The base abstract class representing a connection to an OpenERP Server.
@@ -96,6 +212,36 @@ class Connector(object):
         """
         return Service(self, service_name)
 
+# bytes sent and received by the current thread's RPCs, for RpcMetrics
+_wire = threading.local()
+
+class _CountingResponse(object):
+    "counts what is read from an HTTP response"
+
+    def __init__(self, response):
+        self._response = response
+
+    def read(self, *args):
+        data = self._response.read(*args)
+        _wire.received = getattr(_wire, 'received', 0) + len(data)
+        return data
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+def _counting_transport(base):
+    class CountingTransport(base):
+        def send_content(self, connection, request_body):
+            _wire.sent = getattr(_wire, 'sent', 0) + len(request_body)
+            return base.send_content(self, connection, request_body)
+        def parse_response(self, response):
+            return base.parse_response(self, _CountingResponse(response))
+    CountingTransport.__name__ = 'Counting' + base.__name__
+    return CountingTransport
+
+_CountingTransport = _counting_transport(Transport)
+_CountingSafeTransport = _counting_transport(SafeTransport)
+
 class XmlRPCConnector(Connector):
     """
     A type of connector that uses the XMLRPC protocol.
@@ -114,33 +260,17 @@ class XmlRPCConnector(Connector):
 
     def send(self, service_name, method, *args):
         url = '%s/%s' % (self.url, service_name)
-        service = ServerProxy(url)
+        if url.startswith('https'):
+            service = ServerProxy(url, transport=_CountingSafeTransport())
+        else:
+            service = ServerProxy(url, transport=_CountingTransport())
         try:
             return getattr(service, method)(*args)
-        except Fault as exc1:
-            exc = str(exc1)
-            if oe_exc(exc):
-                error, msg = oe_exc.groups()
-                if msg.endswith(": ''"):
-                    msg = msg[:-4]
-                try:
-                    exc2 = '%s%s' % (error, msg)
-                    exc2 = eval(exc2.replace('\\',''))
-                    raise_exc(exc2, cause=None)
-                except KeyError:
-                    raise exc1
-            if python_exc(exc):
-                error, msg = python_exc.groups()
-                try:
-                    exc2 = getattr(builtins, error)
-                except:
-                    raise exc1
-                else:
-                    # exc2 = exc2(msg)
-                    # exc2.__cause__ = None
-                    # raise exc2
-                    raise_exc(exc2(msg), cause=None)
-            raise
+        except Fault as exc:
+            error = fault_map.translate(exc.faultString)
+            if error is None:
+                raise
+            raise_exc(error, cause=None)
 
 
 class XmlRPCSConnector(XmlRPCConnector):
@@ -168,13 +298,22 @@ def json_rpc(url, fct_name, params):
         "params": params,
         "id": random.randint(0, 1000000000),
     }
-    req = Request(url=url, data=json.dumps(data), headers={
+    data = json.dumps(data).encode('utf-8')
+    _wire.sent = getattr(_wire, 'sent', 0) + len(data)
+    req = Request(url=url, data=data, headers={
         "Content-Type":"application/json",
     })
-    result = urlopen(req)
-    result = json.load(result)
+    result = urlopen(req).read()
+    _wire.received = getattr(_wire, 'received', 0) + len(result)
+    result = json.loads(result)
     if result.get("error", None):
-        raise JsonRPCException(result["error"])
+        error = result["error"]
+        data = error.get("data") if isinstance(error, dict) else None
+        if isinstance(data, dict):
+            exc = fault_map.translate(data.get("debug"))
+            if exc is not None:
+                raise exc
+        raise JsonRPCException(error)
     return result["result"]
 
 class JsonRPCConnector(Connector):
@@ -215,6 +354,176 @@ class JsonRPCSConnector(Connector):
     def send(self, service_name, method, *args):
         return json_rpc(self.url, "call", {"service": service_name, "method": method, "args": args})
 
+class RecordingConnector(Connector):
+    """
+    A connector that passes every call to `connector` and saves the call, its
+    response (or error), and how long it took, to `filename` (one json object
+    per line; gzipped if the name ends in .gz).  Passwords are not saved.
+
+    The file is flushed every `flush_every` calls and closed by close(), or
+    on leaving a with block.
+    """
+
+    __logger = _getChildLogger(_logger, 'connector.recording')
+
+    flush_every = 1000
+
+    def __init__(self, connector, filename):
+        """
+        :param connector: The Connector to record (from get_connector()).
+        :param filename: The file to save the calls in.
+        """
+        self.connector = connector
+        self.filename = filename
+        self.PROTOCOL = getattr(connector, 'PROTOCOL', None)
+        self._lock = threading.Lock()
+        self._file = _open_calls(filename, 'w')
+        self._unflushed = 0
+        self._write({'protocol': self.PROTOCOL})
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def send(self, service_name, method, *args):
+        start = _timer()
+        try:
+            result = self.connector.send(service_name, method, *args)
+        except Exception:
+            exc = sys.exc_info()[1]
+            self._write({
+                    'service': service_name, 'method': method, 'args': _unsecret(service_name, args),
+                    'elapsed': _timer() - start, 'error': _error_info(exc),
+                    })
+            raise
+        self._write({
+                'service': service_name, 'method': method, 'args': _unsecret(service_name, args),
+                'elapsed': _timer() - start, 'result': result,
+                })
+        return result
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _write(self, entry):
+        line = json.dumps(entry, separators=(',', ':'), default=_jsonable) + '\n'
+        with self._lock:
+            if self._file is None:
+                raise ValueError('%r is closed' % (self.filename, ))
+            self._file.write(line.encode('utf-8'))
+            self._unflushed += 1
+            if self._unflushed >= self.flush_every:
+                self._file.flush()
+                self._unflushed = 0
+
+class ReplayConnector(Connector):
+    """
+    A connector that answers calls from a RecordingConnector file instead of a
+    server.  Calls are matched on service, method, and arguments (passwords are
+    ignored); a call made more often than it was recorded gets the last recorded
+    response again.  With `timing` each response is delayed by as long as the
+    recorded call took.
+    """
+
+    __logger = _getChildLogger(_logger, 'connector.replay')
+
+    def __init__(self, filename, timing=False):
+        """
+        :param filename: A file saved by RecordingConnector.
+        :param timing: True to take as long as the recorded calls did.
+        """
+        self.filename = filename
+        self.timing = timing
+        self.PROTOCOL = None
+        self._lock = threading.Lock()
+        self._responses = {}
+        with _open_calls(filename, 'r') as calls:
+            for line in calls:
+                entry = json.loads(line.decode('utf-8'), object_hook=_from_jsonable)
+                if 'service' not in entry:
+                    self.PROTOCOL = entry.get('protocol')
+                    continue
+                key = _call_key(entry['service'], entry['method'], entry['args'])
+                self._responses.setdefault(key, deque()).append(entry)
+
+    def send(self, service_name, method, *args):
+        args = _unsecret(service_name, args)
+        key = _call_key(service_name, method, args)
+        with self._lock:
+            responses = self._responses.get(key)
+            if not responses:
+                raise ValueError('no recorded response for %s.%s%r' % (service_name, method, args))
+            entry = responses[0] if len(responses) == 1 else responses.popleft()
+        if self.timing:
+            time.sleep(entry['elapsed'])
+        if 'error' in entry:
+            raise _replayed_error(entry['error'])
+        return entry['result']
+
+def _open_calls(filename, mode):
+    if filename.endswith('.gz'):
+        return gzip.open(filename, mode + 'b')
+    return open(filename, mode + 'b')
+
+def _unsecret(service_name, args):
+    "`args` without the password (the third argument for the common and object services)"
+    if service_name in ('common', 'object') and len(args) > 2:
+        args = args[:2] + (None, ) + args[3:]
+    return args
+
+def _call_key(service_name, method, args):
+    return json.dumps([service_name, method, args], sort_keys=True, default=_jsonable)
+
+def _jsonable(value):
+    "json fallback for values the xmlrpc library may produce, tagged so _from_jsonable can rebuild them"
+    if isinstance(value, _XmlBinary):
+        return {'__binary__': b64encode(value.data).decode('ascii')}
+    if isinstance(value, _XmlDateTime):
+        return {'__datetime__': value.value}
+    if isinstance(value, bytes):
+        return {'__bytes__': b64encode(value).decode('ascii')}
+    return str(value)
+
+def _from_jsonable(obj):
+    "json object_hook undoing _jsonable"
+    if len(obj) == 1:
+        if '__binary__' in obj:
+            return _XmlBinary(b64decode(obj['__binary__']))
+        if '__datetime__' in obj:
+            return _XmlDateTime(obj['__datetime__'])
+        if '__bytes__' in obj:
+            return b64decode(obj['__bytes__'])
+    return obj
+
+def _error_info(exc):
+    if isinstance(exc, Fault):
+        return {'type': 'Fault', 'args': [exc.faultCode, exc.faultString]}
+    args = list(exc.args)
+    try:
+        json.dumps(args)
+    except (TypeError, ValueError):
+        args = [str(exc)]
+    return {'type': exc.__class__.__name__, 'args': args}
+
+def _replayed_error(info):
+    name, args = info['type'], info['args']
+    cls = {
+            'Fault': Fault,
+            'JsonRPCException': JsonRPCException,
+            'AuthenticationError': AuthenticationError,
+            }.get(name) or fault_map.classes.get(name)
+    if cls is not None:
+        try:
+            return cls(*args)
+        except Exception:
+            pass
+    return Exception('%s: %s' % (name, ', '.join([str(a) for a in args])))
+
 class Service(object):
     """
     A class to execute RPC calls on a specific service of the remote server.
@@ -237,9 +546,17 @@ class Service(object):
             """
             :param args: A list of values for the method
             """
-            self.__logger.debug('args: %r', args)
+            if not self.__logger.isEnabledFor(logging.DEBUG):
+                return self.connector.send(self.service_name, method, *args)
+            self.__logger.debug('%s.%s  args: %s', self.service_name, method, debug_log.brief(args))
+            start = _timer()
             result = self.connector.send(self.service_name, method, *args)
-            self.__logger.debug('result: %r', result)
+            self.__logger.debug(
+                    '%s.%s  %s in %.4fs  result: %s',
+                    self.service_name, method, _count(result), _timer() - start, debug_log.brief(result),
+                    )
+            if debug_log.capture():
+                _payload_logger.debug('%s.%s  args: %r  result: %r', self.service_name, method, args, result)
             return result
         return proxy
 
@@ -255,7 +572,9 @@ class Connection(object):
                  login=None,
                  password=None,
                  user_id=None,
-                 raw=False
+                 raw=False,
+                 record_store=None,
+                 metrics=None,
                  ):
         """
         Initialize with login information. The login information is facultative to allow specifying
@@ -268,8 +587,12 @@ class Connection(object):
         :param user_id: The user id is a number identifying the user. This is only useful if you
         already know it, in most cases you don't need to specify it.
         :param raw: True returns data as-is, False converts data to Python objects.
+        :param record_store: A RecordStore to serve reads from (and save them to).
+        :param metrics: An RpcMetrics to record each Model call in.
         """
         self.connector = connector
+        self.record_store = record_store
+        self.metrics = metrics
 
         self.set_login_info(database, login, password, user_id)
         self.user_context = None
@@ -456,8 +779,11 @@ class Model(object):
                 enum = d.get('enum')
                 if enum:
                     name = enum[0]
-                    items = [(m[0], tuple(m[1])) for m in enum[1:]]
-                    enum = SelectionEnum(name, items)
+                    items = tuple([(m[0], tuple(m[1])) for m in enum[1:]])
+                    key = model_name, f, name, items
+                    if key not in _selection_enums:
+                        _selection_enums[key] = SelectionEnum(name, list(items))
+                    enum = _selection_enums[key]
                     self._enum_fields[f] = enum
                     setattr(self, name, enum)
             else:
@@ -474,9 +800,16 @@ class Model(object):
             """
             :param args: A list of values for the method
             """
-            self.__logger.debug(method)
-            self.__logger.debug('args: %r   kwds: %r', args, kwds)
+            debug = self.__logger.isEnabledFor(logging.DEBUG)
+            if debug:
+                self.__logger.debug(
+                        '%s.%s  args: %s   kwds: %s',
+                        self.model_name, method, debug_log.brief(args), debug_log.brief(kwds),
+                        )
             self.connection.check_login(False)
+            metrics = self.connection.metrics
+            if metrics is not None or debug:
+                start = _timer()
             #
             # pre-process
             #
@@ -485,12 +818,17 @@ class Model(object):
                 imd_info = kwds.pop('imd_info', None)
                 if imd_info and not isinstance(imd_info, AttrDict):
                     imd_info = AttrDict(**imd_info)
+                # default values already fetched by the caller (e.g. for many creates)
+                default_values = kwds.pop('defaults', None)
                 # get the values, fields, and default values
                 new_values = kwds.pop('values', None) or args[0]
                 if imd_info is None and isinstance(new_values, XidRec):
                     imd_info = new_values._imd
                 fields = self._all_columns
-                default_values = self.default_get(fields.keys())
+                if default_values is None:
+                    default_values = self.default_get(list(fields.keys()))
+                else:
+                    default_values = dict(default_values)
                 # take special care with x2many fields 'cause they come to us as a list of
                 # ids which we must transform into a list of delete and add commands such as
                 # [(3, id1), (4, id1), (3, id2), (4, id2), ...]
@@ -512,7 +850,8 @@ class Model(object):
                 # update the defaults from the passed in values
                 default_values.update(new_values)
                 args = (default_values, ) + args[1:]
-                self.__logger.debug('args: %r   kwds: %r', args, kwds)
+                if debug:
+                    self.__logger.debug('%s.create  values: %s', self.model_name, debug_log.brief(args[0]))
             #
             elif method == 'read':
                 # convert any kwds to args
@@ -572,29 +911,48 @@ class Model(object):
             #
             # ensure everything is marshalable
             #
+            if metrics is not None:
+                # after the pre-processing, which may make calls of its own (create's default_get)
+                start_marshal = _timer()
             new_args = []
             for i, a in enumerate(args):
                 if isinstance(a, (AttrDict, dict, list, tuple)):
                     a = pfm(a)
+                elif isinstance(a, WireReady):
+                    a = a.values
                 new_args.append(a)
             args = tuple(new_args)
             for k, v in kwds.items():
                 if isinstance(v, (AttrDict, dict, list, tuple)):
                     kwds[k] = pfm(v)
+                elif isinstance(v, WireReady):
+                    kwds[k] = v.values
             #
             # call method
             #
             # print('model: %r\n  args: %r\n  kwds: %r' % (self.model_name, args, kwds))
-            result = self.connection.get_service('object').execute_kw(
-                                                    self.connection.database,
-                                                    self.connection.user_id,
-                                                    self.connection.password,
-                                                    self.model_name,
-                                                    method,
-                                                    args,
-                                                    kwds
-                                                    )
-            self.__logger.debug('immediate result: %r', result)
+            if metrics is not None:
+                marshalled = _timer()
+                _wire.sent = _wire.received = 0
+            try:
+                result = self._execute(method, args, kwds)
+            except Exception:
+                if metrics is not None:
+                    metrics.record(RpcCall(
+                            self.model_name, method, marshalled - start_marshal, _timer() - marshalled, 0.0,
+                            _wire.sent, _wire.received, sys.exc_info()[0].__name__,
+                            ))
+                raise
+            if metrics is not None:
+                called = _timer()
+                sent, received = _wire.sent, _wire.received
+            if debug:
+                self.__logger.debug('%s.%s  immediate result: %s', self.model_name, method, debug_log.brief(result))
+                if debug_log.capture():
+                    _payload_logger.debug(
+                            '%s.%s  args: %r   kwds: %r   result: %r',
+                            self.model_name, method, args, kwds, result,
+                            )
             #
             # post-process
             #
@@ -698,17 +1056,13 @@ class Model(object):
                                 except:
                                     r[f] = Binary(r[f])
                         elif f in self._date_fields:
-                            for r in result:
-                                if not r[f]:
-                                    r[f] = None
-                                else:
-                                    r[f] = Date.strptime(r[f][:10], DEFAULT_SERVER_DATE_FORMAT)
+                            values = str_to_date_many([r[f] and r[f][:10] for r in result])
+                            for r, value in zip(result, values):
+                                r[f] = value or None
                         elif f in self._datetime_fields:
-                            for r in result:
-                                if not r[f]:
-                                    r[f] = None
-                                else:
-                                    r[f] = DateTime.strptime(r[f].split('.')[0], DEFAULT_SERVER_DATETIME_FORMAT).replace(tzinfo=UTC)
+                            values = str_to_datetime_many([r[f] for r in result], localtime=False)
+                            for r, value in zip(result, values):
+                                r[f] = value or None
                         elif f in self._enum_fields:
                             enum = self._enum_fields[f]
                             for r in result:
@@ -778,10 +1132,60 @@ class Model(object):
                 except Exception:
                     pass
             #
-            self.__logger.debug('final result: %r', result)
+            if metrics is not None:
+                metrics.record(RpcCall(
+                        self.model_name, method, marshalled - start_marshal, called - marshalled, _timer() - called,
+                        sent, received, None,
+                        ))
+            if debug:
+                self.__logger.debug(
+                        '%s.%s  %s in %.4fs  final result: %s',
+                        self.model_name, method, _count(result), _timer() - start, debug_log.brief(result),
+                        )
             return result
         return proxy
 
+    def _execute(self, method, args, kwds):
+        "send the (marshalled) call to the server"
+        store = self.connection.record_store
+        if (
+                method == 'read'
+                and store is not None
+                and 'write_date' in self._all_columns
+                and len(args) in (1, 2)
+                and isinstance(args[0], list)
+                and _integer_types.issuperset(map(type, args[0]))
+                and set(kwds) <= set(['context'])
+                and set(kwds.get('context') or {}) <= set(['active_test'])
+            ):
+            # plain read of ids -- let the record store decide what to fetch
+            def fetch(ids, fields):
+                return self.connection.get_service('object').execute_kw(
+                        self.connection.database,
+                        self.connection.user_id,
+                        self.connection.password,
+                        self.model_name,
+                        'read',
+                        [ids, fields],
+                        kwds,
+                        )
+            fields = args[1] if len(args) > 1 else list(self._all_columns.keys())
+            result = store.read(
+                    self.connection.database, self.connection.user_id, self.model_name,
+                    args[0], fields, fetch,
+                    )
+        else:
+            result = self.connection.get_service('object').execute_kw(
+                                                    self.connection.database,
+                                                    self.connection.user_id,
+                                                    self.connection.password,
+                                                    self.model_name,
+                                                    method,
+                                                    args,
+                                                    kwds
+                                                    )
+        return result
+
     def __repr__(self):
         return "Model(%r, raw=%r)" % (self.model_name, self.raw)
 
@@ -849,29 +1253,233 @@ class Model(object):
         records = self.read(record_ids, fields, context or {})
         return records
 
-def get_connector(hostname=None, protocol="xmlrpc", port="auto"):
+    def export_columns(self, domain, fields, path, format='parquet', page_size=10000, context=None):
+        """
+        Write the records matching `domain` into a columnar file at `path`.
+
+        `format` is 'parquet' (one row group per page) or 'arrow' (an Arrow IPC
+        file, which can be memory-mapped); column types follow the field types,
+        many2one fields become (id, name) structs and x2many fields lists of
+        ids.  `fields` of None means all fields.  Needs pyarrow.
+
+        :return: The number of records written.
+        """
+        if pyarrow is None:
+            raise ImportError('export_columns() requires pyarrow')
+        if format not in ('parquet', 'arrow'):
+            raise ValueError('unknown columnar format: %r' % (format, ))
+        fields = self._export_fields(fields, [f for f in self._all_columns if f in self._as_dbf])
+        columns = [(f, ) + self._column_converter(f) for f in fields]
+        schema = pyarrow.schema([(f, kind) for f, kind, _ in columns])
+        if format == 'parquet':
+            writer = pyarrow.parquet.ParquetWriter(path, schema)
+        else:
+            writer = pyarrow.ipc.new_file(path, schema)
+        count = 0
+        try:
+            for records in self._raw_pages(domain, fields, page_size, context):
+                writer.write_batch(pyarrow.RecordBatch.from_arrays(
+                        [
+                            pyarrow.array([convert(r[f]) for r in records], type=kind)
+                            for f, kind, convert in columns
+                            ],
+                        schema=schema,
+                        ))
+                count += len(records)
+        finally:
+            writer.close()
+        return count
+
+    def _column_converter(self, field):
+        "return the arrow type of `field`, and a function to turn a raw value into it"
+        if field in self._binary_fields:
+            def convert(value):
+                if not value:
+                    return None
+                if not isinstance(value, bytes):
+                    value = value.encode('utf-8')
+                return b64decode(value)
+            return pyarrow.binary(), convert
+        elif field in self._x2one_fields:
+            def convert(value):
+                # value == [id, text]
+                return value and {'id': value[0], 'name': value[1]} or None
+            return pyarrow.struct([('id', pyarrow.int64()), ('name', pyarrow.string())]), convert
+        elif field in self._x2many_fields:
+            return pyarrow.list_(pyarrow.int64()), list
+        elif field in self._date_fields:
+            return pyarrow.date32(), _raw_date
+        elif field in self._datetime_fields:
+            return pyarrow.timestamp('s', tz='UTC'), _raw_datetime
+        elif field in self._boolean_fields:
+            return pyarrow.bool_(), bool
+        elif field in self._integer_fields or field in self._float_fields:
+            def convert(value):
+                return None if value is False else value
+            if field in self._integer_fields:
+                return pyarrow.int64(), convert
+            return pyarrow.float64(), convert
+        else:
+            def convert(value):
+                if value in (False, None):
+                    return None
+                if isinstance(value, bytes):
+                    return value.decode('utf-8')
+                return str(value)
+            return pyarrow.string(), convert
+
+    def export_dbf(self, domain, fields, path, page_size=1000, context=None):
+        """
+        Write the records matching `domain` into a new dbf table at `path`.
+
+        The table is built from the `_as_dbf` specs of `fields` (None means all
+        fields except binary ones); records are read `page_size` at a time,
+        unconverted, and appended to the table as each page arrives.
+
+        :return: The number of records written.
+        """
+        fields = self._export_fields(fields, [
+                f for f in self._all_columns
+                if f in self._as_dbf and f not in self._binary_fields
+                ])
+        seen = set()
+        duplicates = []
+        for f in fields:
+            name = self._as_dbf[f].name.upper()
+            if name in seen:
+                duplicates.append(f)
+            seen.add(name)
+        if duplicates:
+            raise ValueError('dbf field name(s) already in use: %s' % ', '.join(sorted(duplicates)))
+        converters = [(f, self._dbf_converter(f)) for f in fields]
+        table = Table(path, '; '.join(self._as_dbf[f].spec for f in fields), dbf_type='vfp', codepage='utf8')
+        count = 0
+        table.open(READ_WRITE)
+        try:
+            for records in self._raw_pages(domain, fields, page_size, context):
+                for record in records:
+                    table.append(tuple([convert(record[f]) for f, convert in converters]))
+                count += len(records)
+        finally:
+            table.close()
+        return count
+
+    def _dbf_converter(self, field):
+        "return a function to turn a raw `field` value into what its dbf column accepts"
+        size = dbf_char_size.match(self._as_dbf[field].spec)
+        size = size and int(size.group(1))
+        if field in self._text_fields or field in self._selection_fields:
+            def convert(value):
+                if not value:
+                    return None
+                if isinstance(value, bytes):
+                    value = value.decode('utf-8')
+                return _dbf_truncate(value, size)
+        elif field in self._binary_fields:
+            def convert(value):
+                if not value:
+                    return None
+                if not isinstance(value, bytes):
+                    value = value.encode('utf-8')
+                return b64decode(value)
+        elif field in self._x2one_fields:
+            def convert(value):
+                # value == [id, text]
+                return value and _dbf_truncate(value[1], size) or None
+        elif field in self._x2many_fields:
+            def convert(value):
+                return ','.join([str(id) for id in value]) or None
+        elif field in self._date_fields:
+            convert = _raw_date
+        elif field in self._datetime_fields:
+            # stored as naive UTC
+            convert = _raw_datetime
+        elif field in self._boolean_fields:
+            convert = bool
+        elif field in self._integer_fields or field in self._float_fields:
+            def convert(value):
+                return None if value is False else value
+        else:
+            def convert(value):
+                return None if value in (False, None) else str(value)
+        return convert
+
+    def _export_fields(self, fields, default):
+        "check `fields` for an export (`default` if None)"
+        fields = list(fields or default)
+        unknown = [f for f in fields if f not in self._as_dbf]
+        if unknown:
+            raise ValueError('unknown field(s): %s' % ', '.join(sorted(unknown)))
+        return fields
+
+    def _raw_pages(self, domain, fields, page_size, context):
+        "yield the unconverted records matching `domain`, `page_size` at a time"
+        context = dict(context or {}, active_test=False)
+        ids = self.search(domain or [], context=context)
+        connection = self.connection
+        service = connection.get_service('object')
+        for start in range(0, len(ids), page_size):
+            records = service.execute_kw(
+                    connection.database, connection.user_id, connection.password,
+                    self.model_name, 'read', [ids[start:start+page_size], fields],
+                    {'context': context},
+                    )
+            self.__logger.debug('%d raw records from offset %d', len(records), start)
+            yield records
+
+def _raw_date(value):
+    "'YYYY-MM-DD' -> date (False -> None)"
+    return _parse_date(value[:10]) if value else None
+
+def _raw_datetime(value):
+    "'YYYY-MM-DD HH:MM:SS' -> naive UTC datetime (False -> None)"
+    return _parse_datetime(value) if value else None
+
+def _dbf_truncate(text, size):
+    "cut `text` to fit in `size` bytes of utf-8 (no limit if `size` is None)"
+    if size is None or len(text) * 4 <= size:
+        return text
+    return text.encode('utf-8')[:size].decode('utf-8', 'ignore')
+
+dbf_char_size = re.compile(r'\S+ C\((\d+)\)$')
+
+# SelectionEnum classes by (model, field, enum name, members), shared by all
+# Model instances
+_selection_enums = {}
+
+def get_connector(hostname=None, protocol="xmlrpc", port="auto", record=None, replay=None):
     """
     A shortcut method to easily create a connector to a remote server using XMLRPC.
 
     :param hostname: The hostname to the remote server.
     :param protocol: The name of the protocol, must be "xmlrpc", "xmlrpcs", "jsonrpc" or "jsonrpcs".
     :param port: The number of the port. Defaults to auto.
+    :param record: A file to save every call and response in (see RecordingConnector).
+    :param replay: A file of recorded calls to answer from instead of a server (see ReplayConnector).
     """
+    if replay is not None:
+        if record is not None:
+            raise ValueError('cannot both record and replay')
+        return ReplayConnector(replay)
     if port == 'auto':
         port = 8069
     if protocol == "xmlrpc":
-        return XmlRPCConnector(hostname, port)
+        connector = XmlRPCConnector(hostname, port)
     elif protocol == "xmlrpcs":
-        return XmlRPCSConnector(hostname, port)
-    if protocol == "jsonrpc":
-        return JsonRPCConnector(hostname, port)
+        connector = XmlRPCSConnector(hostname, port)
+    elif protocol == "jsonrpc":
+        connector = JsonRPCConnector(hostname, port)
     elif protocol == "jsonrpcs":
-        return JsonRPCSConnector(hostname, port)
+        connector = JsonRPCSConnector(hostname, port)
     else:
         raise ValueError("You must choose xmlrpc, xmlrpcs, jsonrpc or jsonrpcs")
+    if record is not None:
+        connector = RecordingConnector(connector, record)
+    return connector
 
 def get_connection(hostname=None, protocol="xmlrpc", port='auto', database=None,
                  login=None, password=None, user_id=None, skip_check=False, raw=False,
+                 record_store=None, metrics=None, record=None, replay=None,
                  ):
     """
     A shortcut method to easily create a connection to a remote OpenERP server.
@@ -887,56 +1495,377 @@ def get_connection(hostname=None, protocol="xmlrpc", port='auto', database=None,
     already know it, in most cases you don't need to specify it.
     :param skip_check: False verifies that model exists.
     :param raw: True returns data as-is, False converts data to Python objects.
+    :param record_store: A RecordStore to serve reads from (and save them to).
+    :param metrics: An RpcMetrics to record each Model call in.
+    :param record: A file to save every call and response in (see RecordingConnector).
+    :param replay: A file of recorded calls to answer from instead of a server (see ReplayConnector).
     """
     connection = Connection(
-            get_connector(hostname, protocol, port),
-            database, login, password, user_id, raw,
+            get_connector(hostname, protocol, port, record, replay),
+            database, login, password, user_id, raw, record_store, metrics,
             )
     # if necessary paramaters given, ensure valid connection unless skip_check is True
     if hostname and database and login and password and not skip_check:
         connection.get_model('res.users').search([('id','=',0)])
     return connection
 
+RpcCall = NamedTuple('RpcCall', ['model', 'method', 'marshal', 'rpc', 'post', 'sent', 'received', 'error'])
+
+_timer = getattr(time, 'perf_counter', time.time)
+
+class RpcMetrics(object):
+    """
+    per model/method call counts, latency histograms, and payload sizes
+
+    each Model call is recorded as an RpcCall (times in seconds, sizes in bytes,
+    error is the exception class name or None) and then passed to each hook;
+    marshal is only the time spent converting the arguments, so calls made
+    while preparing them (create's default_get) are not counted twice;
+    Model calls are not timed at all when connection.metrics is None
+    """
+
+    # upper bounds, in seconds, of the latency histogram buckets
+    buckets = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10)
+
+    def __init__(self, hooks=()):
+        self.hooks = list(hooks)
+        self.stats = {}
+        self._lock = threading.Lock()
+
+    def record(self, call):
+        latency = call.marshal + call.rpc + call.post
+        with self._lock:
+            stats = self.stats.get((call.model, call.method))
+            if stats is None:
+                stats = self.stats[call.model, call.method] = dict(
+                        count=0, errors=0, total=0.0, max=0.0,
+                        marshal=0.0, rpc=0.0, post=0.0, sent=0, received=0,
+                        histogram=[0] * (len(self.buckets) + 1),
+                        )
+            stats['count'] += 1
+            if call.error is not None:
+                stats['errors'] += 1
+            stats['total'] += latency
+            if latency > stats['max']:
+                stats['max'] = latency
+            stats['marshal'] += call.marshal
+            stats['rpc'] += call.rpc
+            stats['post'] += call.post
+            stats['sent'] += call.sent
+            stats['received'] += call.received
+            stats['histogram'][bisect_left(self.buckets, latency)] += 1
+        for hook in self.hooks:
+            hook(call)
+
+    def reset(self):
+        with self._lock:
+            self.stats.clear()
+
+    def snapshot(self):
+        """
+        {'model.method': {...}} of plain values, suitable for json
+        """
+        result = {}
+        with self._lock:
+            for (model, method), stats in self.stats.items():
+                stats = dict(stats)
+                stats['histogram'] = list(zip(self.buckets + ('inf', ), stats['histogram']))
+                result['%s.%s' % (model, method)] = stats
+        return result
+
+
+class ImportPipeline(object):
+    """
+    loads `rows` (mappings of field names to values) into `model_name`
+
+    a reader thread pulls the rows -- parsing the file if they come from
+    CSV.iter_map() or similar -- prepares them with pfm(), and queues them
+    `batch_size` at a time; `workers` threads, each with its own Connection,
+    take them from the queue and send them to the server.  OpenERP's create
+    and write take one record, so each row is still its own call --
+    `batch_size` only saves queue hand-offs.  At most `queued` groups wait in
+    the queue, so a slow server slows the reader down instead of filling memory.
+
+    `method` is 'create', or 'write' (rows must then have an 'id').  For
+    create the model's default values are fetched once per worker, not per
+    row.  Failed rows are kept in `errors` as (row offset, values, exception)
+    and do not stop the load.  If `checkpoint` names a file, the offset of the
+    first row not yet tried and the offsets of the rows that failed are saved
+    there as rows complete; a later run with the same file skips the rows
+    already loaded and tries the failed ones again.
+    """
+
+    __logger = _getChildLogger(_logger, 'import')
+
+    def __init__(self, connection, model_name, rows, method='create', workers=4,
+            batch_size=100, queued=None, checkpoint=None, context=None):
+        if method not in ('create', 'write'):
+            raise ValueError("method must be 'create' or 'write', not %r" % (method, ))
+        self.connection = connection
+        self.model_name = model_name
+        self.rows = rows
+        self.method = method
+        self.workers = workers
+        self.batch_size = batch_size
+        self.queued = queued or 2 * workers
+        self.checkpoint = checkpoint
+        self.context = context
+        self.errors = []
+        self.loaded = 0
+        self.offset = 0     # every row before this one has been tried
+        self.failed = set() # rows before self.offset that did not load
+        if checkpoint and os.path.exists(checkpoint):
+            with open(checkpoint) as cp:
+                lines = cp.read().split('\n')
+            self.offset = int(lines[0].strip() or 0)
+            if len(lines) > 1:
+                self.failed = set([int(o) for o in lines[1].split()])
+        self._done = set()  # rows past self.offset that have been tried
+        self._lock = threading.Lock()
+        self._failure = None
+
+    def run(self):
+        "load the rows; returns the number loaded"
+        queue = Queue(maxsize=self.queued)
+        stop = threading.Event()
+        threads = [threading.Thread(target=self._read, args=(queue, stop))]
+        threads.extend([
+                threading.Thread(target=self._work, args=(queue, stop))
+                for _ in range(self.workers)
+                ])
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if self._failure is not None:
+            raise self._failure
+        return self.loaded
+
+    def _put(self, queue, stop, item):
+        "wait for room in the queue unless the load has been stopped"
+        while not stop.is_set():
+            try:
+                queue.put(item, timeout=0.1)
+                return True
+            except Full:
+                pass
+        return False
+
+    def _read(self, queue, stop):
+        try:
+            batch = []
+            start, failed = self.offset, self.failed.copy()
+            for offset, row in enumerate(self.rows):
+                if offset < start and offset not in failed:
+                    # loaded by a previous run
+                    continue
+                batch.append((offset, pfm(row)))
+                if len(batch) == self.batch_size:
+                    if not self._put(queue, stop, batch):
+                        return
+                    batch = []
+            if batch:
+                self._put(queue, stop, batch)
+        except Exception:
+            self._failure = sys.exc_info()[1]
+            stop.set()
+        finally:
+            for _ in range(self.workers):
+                self._put(queue, stop, None)
+
+    def _work(self, queue, stop):
+        try:
+            connection = Connection(
+                    self.connection.connector,
+                    self.connection.database,
+                    self.connection.login,
+                    self.connection.password,
+                    self.connection.user_id,
+                    raw=True,
+                    )
+            model = connection.get_model(self.model_name)
+            kwds = {}
+            if self.context is not None:
+                kwds['context'] = self.context
+            if self.method == 'create':
+                defaults = model.default_get(list(model._all_columns.keys()), **kwds)
+            while True:
+                try:
+                    item = queue.get(timeout=0.1)
+                except Empty:
+                    if stop.is_set():
+                        return
+                    continue
+                if item is None:
+                    return
+                errors = []
+                for offset, values in item:
+                    try:
+                        if self.method == 'create':
+                            model.create(values, defaults=defaults, **kwds)
+                        else:
+                            values = values.copy()
+                            model.write(values.pop('id'), values, **kwds)
+                    except Exception:
+                        exc = sys.exc_info()[1]
+                        self.__logger.error('row %d: %s', offset, exc)
+                        errors.append((offset, values, exc))
+                self._complete([offset for offset, values in item], errors)
+        except Exception:
+            self._failure = sys.exc_info()[1]
+            stop.set()
+
+    def _complete(self, offsets, errors):
+        with self._lock:
+            self.errors.extend(errors)
+            self.loaded += len(offsets) - len(errors)
+            failed = self.failed.copy()
+            self.failed.difference_update(offsets)
+            self.failed.update([offset for offset, values, exc in errors])
+            offset = self.offset
+            self._done.update([o for o in offsets if o >= offset])
+            while self.offset in self._done:
+                self._done.remove(self.offset)
+                self.offset += 1
+            if self.checkpoint and (self.offset != offset or self.failed != failed):
+                temp = self.checkpoint + '.tmp'
+                with open(temp, 'w') as cp:
+                    cp.write('%d\n%s\n' % (self.offset, ' '.join([str(o) for o in sorted(self.failed)])))
+                if hasattr(os, 'replace'):
+                    os.replace(temp, self.checkpoint)
+                else:
+                    # python 2
+                    if os.path.exists(self.checkpoint):
+                        os.remove(self.checkpoint)
+                    os.rename(temp, self.checkpoint)
+
+
 def pfm(values):
     "prepare for marshalling"
     if isinstance(values, (dict, AttrDict)):
+        converters = _converters
         new_values = {}
         for k, v in values.items():
-            new_values[k] = _convert(v)
+            kind = type(v)
+            convert = converters.get(kind, _unresolved)
+            if convert is _unresolved:
+                convert = _converter(kind)
+            new_values[k] = v if convert is None else convert(v)
         return new_values
     elif isinstance(values, IDEquality):
         return values.id or False
     elif isinstance(values, (list, tuple)):
-        new_list = []
-        for v in values:
-            new_list.append(_convert(v))
-        return type(values)(new_list)
+        if _wire_types.issuperset(map(type, values)):
+            # nothing to convert (e.g. a list of ids), so no need to copy it
+            return values
+        if all(isinstance(v, (dict, AttrDict)) for v in values):
+            return type(values)(_pfm_records(values))
+        return type(values)([_convert(v) for v in values])
+    elif isinstance(values, WireReady):
+        return values.values
     else:
         raise ValueError('not sure how to convert %r' % (values, ))
 
+def _pfm_records(records):
+    "pfm() for a list of records, with the datetimes of all of them converted together"
+    converters = _converters
+    result = []
+    stamps = []
+    for record in records:
+        new_values = {}
+        for k, v in record.items():
+            kind = type(v)
+            convert = converters.get(kind, _unresolved)
+            if convert is _unresolved:
+                convert = _converter(kind)
+            if convert is None:
+                new_values[k] = v
+            elif convert is local_to_utc_str:
+                stamps.append((new_values, k, v))
+            else:
+                new_values[k] = convert(v)
+        result.append(new_values)
+    if stamps:
+        strings = local_to_utc_str_many([v for _, _, v in stamps])
+        for (new_values, k, _), string in zip(stamps, strings):
+            new_values[k] = string
+    return result
+
 def _convert(value):
-    if not value and isinstance(value, (str, number, bool)):
-        return value
-    elif isinstance(value, (date, Date)):
-        return value.strftime(DEFAULT_SERVER_DATE_FORMAT)
-    elif isinstance(value, (datetime, DateTime)):
-        return local_to_utc(value).strftime(DEFAULT_SERVER_DATETIME_FORMAT)
-    elif isinstance(value, IDEquality):
-        return value.id or False
-    elif isinstance(value, SelectionEnum):
-        return value.db
-    elif isinstance(value, Enum):
-        return value.value
-    elif isinstance(value, PostalCode):
-        return value.code
-    elif isinstance(value, Phone):
-        return value.number or False
-    elif isinstance(value, (dict, AttrDict, list, tuple)):
-        return pfm(value)
-    elif value is None:
-        return False
+    kind = type(value)
+    convert = _converters.get(kind, _unresolved)
+    if convert is _unresolved:
+        convert = _converter(kind)
+    return value if convert is None else convert(value)
+
+def _converter(kind):
+    "find and remember how _convert() handles values of type `kind` (None means as-is)"
+    if issubclass(kind, (datetime, DateTime)):
+        # before date, as datetime is a subclass of date
+        convert = local_to_utc_str
+    elif issubclass(kind, (date, Date)):
+        convert = _date_str
+    elif issubclass(kind, IDEquality):
+        convert = _id_or_false
+    elif issubclass(kind, SelectionEnum):
+        convert = attrgetter('db')
+    elif issubclass(kind, Enum):
+        convert = attrgetter('value')
+    elif issubclass(kind, PostalCode):
+        convert = attrgetter('code')
+    elif issubclass(kind, Phone):
+        convert = _number_or_false
+    elif issubclass(kind, (dict, AttrDict, list, tuple)):
+        convert = pfm
+    elif issubclass(kind, WireReady):
+        convert = attrgetter('values')
+    elif kind is NoneType:
+        convert = _false
     else:
-        return value
+        convert = None
+    if convert is not None and issubclass(kind, (str, number, bool)):
+        # empty and zero values of these go out as they are
+        specific = convert
+        def convert(value):
+            return specific(value) if value else value
+    if len(_converters) > 1000:
+        # types made on the fly (such as SelectionEnums) should not pile up
+        _converters.clear()
+    _converters[kind] = convert
+    return convert
+
+def _date_str(value):
+    return value.strftime(DEFAULT_SERVER_DATE_FORMAT)
+
+def _id_or_false(value):
+    return value.id or False
+
+def _number_or_false(value):
+    return value.number or False
+
+def _false(value):
+    return False
+
+NoneType = type(None)
+_unresolved = object()
+_converters = {}
+_integer_types = frozenset(baseinteger)
+_wire_types = frozenset(baseinteger + basestring + (bytes, float, bool))
+
+class WireReady(object):
+    """
+    wraps arguments that need no conversion (such as a large list of ids) so
+    Model calls send them untouched; the contents are not checked
+    """
+    __slots__ = ('values', )
+
+    def __init__(self, values):
+        self.values = values
+
+    def __repr__(self):
+        return '%s(<%d values>)' % (self.__class__.__name__, len(self.values))
+
 
 def dbf_field_name(name):
     if len(name) <= 10:
@@ -1021,3 +1950,77 @@ class ValidationError(ErpError):
 
 class ConstraintError(ErpError):
     pass
+
+
+# server errors
+
+class FaultMap(object):
+    """
+    turns the end of a server traceback ("SomeError: message", from the last
+    line naming a registered error) into an instance of the class registered
+    for SomeError
+    """
+
+    # "Name: message" (the message may run on over further lines), or a bare
+    # "Name" that is the whole of the last line
+    _name_line = re.compile(r'^(?:\w+\.)*(\w+): *', re.M)
+    _bare_line = re.compile(r'(?:\w+\.)*(\w+)$')
+
+    def __init__(self):
+        self.classes = {}
+
+    def register(self, cls, name=None):
+        "map the server's `name` (default: the class name) to `cls`"
+        self.classes[name or cls.__name__] = cls
+        return cls
+
+    def translate(self, text):
+        "return the exception for traceback `text`, or None if nothing matches"
+        if not text:
+            return None
+        text = text.rstrip()
+        match = self._bare_line.match(text.rsplit('\n', 1)[-1])
+        if match is not None:
+            name, msg = match.group(1), ''
+        else:
+            # the last registered name, as the message itself may hold "Name: " lines
+            for match in reversed(list(self._name_line.finditer(text))):
+                if match.group(1) in self.classes:
+                    break
+            else:
+                return None
+            name, msg = match.group(1), text[match.end():]
+        cls = self.classes.get(name)
+        if cls is None:
+            return None
+        if msg.endswith(": ''"):
+            msg = msg[:-4]
+        if issubclass(cls, ErpError):
+            args = _fault_args(msg)
+        else:
+            args = (msg, )
+        try:
+            return cls(*args)
+        except Exception:
+            return None
+
+def _fault_args(msg):
+    "ErpError arguments from the server's message, which may be a repr of them"
+    msg = msg.strip()
+    if not msg:
+        return ()
+    if msg[0] == '(':
+        try:
+            value = ast.literal_eval(msg)
+        except (ValueError, SyntaxError):
+            pass
+        else:
+            if isinstance(value, tuple):
+                return value
+            return (value, )
+    return (msg, )
+
+fault_map = FaultMap()
+for _cls in (AccessDenied, AccessError, MissingError, ValidationError, ConstraintError, ValueError, KeyError):
+    fault_map.register(_cls)
+del _cls
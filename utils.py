@@ -26,11 +26,22 @@
 import os as _os
 import sys as _sys
 import aenum as _aenum
+import ast
 import codecs
+import io
+import json
+import multiprocessing
+import re
+import sqlite3
+import threading
+import time
 from . import dates
+from array import array
+from hashlib import sha1
 from base64 import b64decode
-from dbf import Date, Time
-from collections import defaultdict, OrderedDict
+from dbf import Date, DateTime, Time
+from collections import defaultdict, deque, OrderedDict
+from itertools import islice
 from pprint import pformat
 from scription import integer as baseinteger, basestring, str, echo, unicode
 from warnings import warn
@@ -43,6 +54,14 @@ except ImportError:
 
 py_ver = _sys.version_info[:2]
 
+try:
+    # 64-bit on every platform ('l' is 32-bit on Windows)
+    array('q')
+    _OFFSET_CODE = 'q'
+except ValueError:
+    # python 2: doubles hold offsets exactly up to 2**53
+    _OFFSET_CODE = 'd'
+
 ALL_RECORDS = [(1,'=',1)]
 
 
@@ -106,12 +125,16 @@ def translator(frm=u'', to=u'', delete=u'', keep=u'', strip=_trans_sentinel, com
             )
     for ch in delete:
         uni_table[ord(ch)] = None
+    if keep:
+        # everything not kept becomes the replacement (or is removed); the
+        # table is never changed after this, so it is safe to share
+        uni_table = _KeepTable(
+                replacement_ord,
+                [(ord(ch), uni_table.get(ord(ch), ord(ch))) for ch in keep],
+                )
     def translate(s):
         if isinstance(s, bytes):
             s = s.decode('latin1')
-        if keep:
-            for chr in set(s) - set(keep):
-                uni_table[ord(chr)] = replacement_ord
         s = s.translate(uni_table)
         if strip is not _trans_sentinel:
             s = s.strip(strip)
@@ -121,6 +144,17 @@ def translator(frm=u'', to=u'', delete=u'', keep=u'', strip=_trans_sentinel, com
     return translate
 
 
+class _KeepTable(dict):
+    "translation table that maps any character it does not hold to `missing`"
+
+    def __init__(self, missing, items):
+        super(_KeepTable, self).__init__(items)
+        self.missing = missing
+
+    def __missing__(self, key):
+        return self.missing
+
+
 class AttrDict(object):
     """
     allows dictionary lookup using . notation
@@ -551,14 +585,173 @@ def get_records(
             result = result[0]
     return result
 
+class RecordStore(object):
+    """
+    on-disk cache of raw records, keyed by (db, user, model, id) and checked against write_date
+
+    pass one to Connection (or get_connection) as `record_store`; Model.read then
+    asks the server only for the write_date of cached records, and for the full
+    record only when that has changed -- if `max_age` is given, records checked
+    within the last `max_age` seconds are served without asking at all
+
+    the store is an sqlite file, so several processes can share it; records are
+    kept per user, as what a user may read depends on its access rights
+    """
+
+    def __init__(self, filename, max_age=None, timeout=30):
+        self.filename = filename
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(filename, timeout=timeout, check_same_thread=False)
+        with self._lock:
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('PRAGMA mmap_size=268435456')
+            with self._db:
+                columns = [r[1] for r in self._db.execute('PRAGMA table_info(records)')]
+                if columns and 'user_id' not in columns:
+                    # written before records were kept per user
+                    self._db.execute('DROP TABLE records')
+                self._db.execute(
+                        'CREATE TABLE IF NOT EXISTS records ('
+                        ' db TEXT, user_id INTEGER, model TEXT, id INTEGER,'
+                        ' write_date TEXT, checked REAL, data TEXT,'
+                        ' PRIMARY KEY (db, user_id, model, id))'
+                        )
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def clear(self, db=None, model=None, user_id=None):
+        "forget all records (of `model`, in `db`, read by `user_id`)"
+        where, args = self._where(db, model, user_id)
+        with self._lock:
+            with self._db:
+                self._db.execute('DELETE FROM records' + where, args)
+
+    def read(self, db, user_id, model, ids, fields, fetch):
+        """
+        return the raw records for `ids`, in order, with `fields` (and id), as
+        read by `user_id`
+
+        fetch(ids, fields) reads raw records from the server
+        """
+        fields = list(fields)
+        wanted = set(fields) | set(['id'])
+        cached = self._load(db, user_id, model, ids)
+        fresh = {}
+        check = []
+        now = time.time()
+        for id, (write_date, checked, record) in cached.items():
+            if not wanted.issubset(record):
+                continue
+            if self.max_age is not None and now - checked <= self.max_age:
+                fresh[id] = record
+            else:
+                check.append(id)
+        if check:
+            current = dict([(r['id'], r['write_date']) for r in fetch(check, ['write_date'])])
+            confirmed = []
+            for id in check:
+                if id in current and current[id] == cached[id][0]:
+                    fresh[id] = cached[id][2]
+                    confirmed.append(id)
+            self._touch(db, user_id, model, confirmed, now)
+        missing = [id for id in ids if id not in fresh]
+        if missing:
+            stored = []
+            for record in fetch(missing, sorted(wanted | set(['write_date']))):
+                id = record['id']
+                old = cached.get(id)
+                if old is not None and old[0] == record['write_date']:
+                    # same version, keep the fields we already had
+                    merged = dict(old[2])
+                    merged.update(record)
+                    record = merged
+                fresh[id] = record
+                stored.append(record)
+            self._save(db, user_id, model, stored, now)
+        result = []
+        for id in ids:
+            record = fresh.get(id)
+            if record is not None:
+                result.append(dict([(f, record[f]) for f in wanted]))
+        return result
+
+    def _load(self, db, user_id, model, ids):
+        "{id: (write_date, checked, record)} for the `ids` already stored"
+        found = {}
+        ids = list(set(ids))
+        with self._lock:
+            for start in range(0, len(ids), 900):
+                chunk = ids[start:start+900]
+                for id, write_date, checked, data in self._db.execute(
+                        'SELECT id, write_date, checked, data FROM records'
+                        ' WHERE db=? AND user_id=? AND model=? AND id IN (%s)' % ','.join('?' * len(chunk)),
+                        [db, user_id, model] + chunk,
+                        ):
+                    found[id] = json.loads(write_date), checked, json.loads(data)
+        return found
+
+    def _save(self, db, user_id, model, records, now):
+        rows = []
+        for record in records:
+            try:
+                rows.append((db, user_id, model, record['id'], json.dumps(record['write_date']), now, json.dumps(record)))
+            except TypeError:
+                # not plain data, so not stored
+                pass
+        with self._lock:
+            with self._db:
+                self._db.executemany('INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+
+    def _touch(self, db, user_id, model, ids, now):
+        with self._lock:
+            with self._db:
+                self._db.executemany(
+                        'UPDATE records SET checked=? WHERE db=? AND user_id=? AND model=? AND id=?',
+                        [(now, db, user_id, model, id) for id in ids],
+                        )
+
+    def _where(self, db, model, user_id):
+        clauses = []
+        args = []
+        if db is not None:
+            clauses.append('db=?')
+            args.append(db)
+        if model is not None:
+            clauses.append('model=?')
+            args.append(model)
+        if user_id is not None:
+            clauses.append('user_id=?')
+            args.append(user_id)
+        return (clauses and ' WHERE ' + ' AND '.join(clauses) or ''), args
+
+
 class Query(object):
+    """
+    retrieves `fields` from `model`, following linked fields ('partner_id/name')
+
+    if `to_file` is given the records are not kept: ids are processed
+    `chunk_size` at a time and the flattened rows are written to `to_file`
+    as csv, using `names` for the header
+
+    `constraints` are callables that accept a record and return True to keep
+    it, and/or (field, operator, value) triples (and the '&', '|', '!'
+    operators) which are added to the server-side search so failing records
+    are never read
+    """
 
-    def __init__(self, model, ids=None, domain=ALL_RECORDS, fields=None, order=None, context=None, unique=False, to_file=None, constraints=(), _parent=None):
+    chunk_size = 1000
+
+    def __init__(self, model, ids=None, domain=ALL_RECORDS, fields=None, order=None, context=None, unique=False, to_file=None, constraints=(), _parent=None, _fetcher=None):
         # fields may be modified (reminder: changes will be seen by caller)
         if context is None:
             context = {}
         if fields is None:
             raise ValueError('FIELDS must be given')
+        if _fetcher is None:
+            _fetcher = QueryFetcher()
         self.name = model.model_name
         if ids:
             if domain and domain != ALL_RECORDS:
@@ -566,6 +759,11 @@ class Query(object):
             if isinstance(ids, baseinteger):
                 ids = [ids]
         elif domain:
+            constraint_domain, python_constraints = _split_constraints(constraints)
+            if constraint_domain:
+                # already applied by the search
+                domain = list(domain) + constraint_domain
+                constraints = python_constraints
             ids = model.search(domain, order=order or False, context=context or {})
         # IDs might be zero if there are no matching parent fields
         #
@@ -573,6 +771,18 @@ class Query(object):
         self.order = fields[:]
         self.fields = self.order
         self.to_file = to_file
+        if to_file is not None and _parent is None:
+            self._stream(model, ids or [], context, unique, constraints, _fetcher.models)
+            return
+        self._plan(model, fields, ids or [], context, constraints, _parent, _fetcher)
+        if _parent is None:
+            # top-level query: read the whole tree of sub-queries a level at a time,
+            # then put the records together
+            _fetcher.run(self)
+            self._link(unique)
+
+    def _plan(self, model, fields, ids, context, constraints, _parent, _fetcher):
+        "create the QueryDomains (and nested Querys) for `fields`, without reading any records"
         # create a field name to display name mapping
         if _parent is None:
             parent_field, parent_display = '', ''
@@ -588,12 +798,12 @@ class Query(object):
                 unique_fields.append(field)
         field_defs = model.fields_get(unique_fields, context=context)
         #
-        main_query = QueryDomain(model, fields, ids, constraints=constraints)
+        main_query = QueryDomain(model, fields, ids, context, constraints, _parent=_parent, _fetcher=_fetcher)
         self.query = main_query
         self.sub_queries = sub_queries = {}
+        self.field_defs = field_defs
         many_fields = [f for f in fields if '/' in f]
         if not many_fields:
-            self.field_defs = field_defs
             # save names
             for n, f in field_defs.items():
                 self.names[parent_field+n] = parent_display + f['string']
@@ -603,7 +813,6 @@ class Query(object):
             for f in many_fields:
                 main_field, sub_field = f.split('/', 1)
                 nested[main_field].append(sub_field)
-            self.field_defs = field_defs
             # save names
             for n, f in field_defs.items():
                 self.names[parent_field+n] = parent_display + f['string']
@@ -614,53 +823,61 @@ class Query(object):
                     raise TypeError('field %r does not link to another table' % main_field)
                 # save name
                 self.names[parent_field+main_field] = main_display = parent_display+field_def['string']
-                sub_model = model.connection.get_model(field_def['relation'])
-                self.sub_queries[main_field] = sub_query = QueryDomain(
-                        sub_model,
-                        sub_fields,
-                        _parent=(main_field, main_display),
-                        )
-                # if sub_query has it's own query, gather updated field names
-                # from it
-                if sub_query.query is not None:
-                    # XXX: does this ever happen?
-                    #    : no - sub_query.query doesn't exist until sub_query
-                    #    :      is run
-                    pass
+                sub_model = _fetcher.get_model(model.connection, field_def['relation'])
+                if any(['/' in f for f in sub_fields]):
+                    # the nested query's own QueryDomain is our sub-query
+                    nested_query = Query(
+                            sub_model, None, None, sub_fields, None, context,
+                            _parent=(main_field, main_display),
+                            _fetcher=_fetcher,
+                            )
+                    sub_query = nested_query.query
+                    sub_query.query = nested_query
+                    self.names.update(nested_query.names)
                 else:
-                    # otherwise, we can figure it out ourselves
+                    sub_query = QueryDomain(
+                            sub_model,
+                            sub_fields,
+                            context=context,
+                            _parent=(main_field, main_display),
+                            _fetcher=_fetcher,
+                            )
                     sub_field_defs = sub_model.fields_get(sub_fields, context=context)
                     # save names
                     for n, f in sub_field_defs.items():
                         self.names[parent_field+main_field+'/'+n] = (
                                 parent_display + main_display + ' -> ' + f['string']
                                 )
-        main_query.run()
-        # gather ids from main query
-        for field, sub_query in sub_queries.items():
-            # if many2one then data is an int or False
-            # otherwise a (possibly empty) list
-            f_type = field_defs[field]['type']
-            if f_type == 'many2one':
-                for rec in main_query.records:
-                    data = rec[field]
-                    if data:
-                        sub_query.ids.append(data.id)
-            elif f_type in ('one2many', 'many2many'):
-                for rec in main_query.records:
-                    data = rec[field]
-                    sub_query.ids.extend(data)
-            else:
-                raise TypeError('unknown link type for %r: %r' % (field, f_type))
-            sub_query.ids = list(set(sub_query.ids))
-        # execute subquery and convert linked fields from ids to records
-        for field, sub_query in sub_queries.items():
-            sub_query.run()
-            if sub_query.query is not None:
-                self.names.update(sub_query.query.names)
+                sub_queries[main_field] = sub_query
+
+    def _linked_ids(self, field):
+        "the ids `field` links to in the (already read) records"
+        # if many2one then data is an int or False
+        # otherwise a (possibly empty) list
+        f_type = self.field_defs[field]['type']
+        ids = []
+        if f_type == 'many2one':
+            for rec in self.query.records:
+                data = rec[field]
+                if data:
+                    ids.append(data.id)
+        elif f_type in ('one2many', 'many2many'):
+            for rec in self.query.records:
+                # Many2One entries unless the model is raw
+                ids.extend([getattr(d, 'id', d) for d in rec[field]])
+        else:
+            raise TypeError('unknown link type for %r: %r' % (field, f_type))
+        return list(set(ids))
+
+    def _link(self, unique=False):
+        "convert linked fields from ids to the (already read) records of the sub-queries"
+        main_query = self.query
+        for field, sub_query in self.sub_queries.items():
+            if isinstance(sub_query.query, Query):
+                sub_query.query._link()
             # if many2one then data is an int or False
             # otherwise a (possibly empty) list
-            f_type = field_defs[field]['type']
+            f_type = self.field_defs[field]['type']
             if f_type == 'many2one':
                 for rec in main_query.records:
                     if rec[field]:
@@ -679,15 +896,8 @@ class Query(object):
                         new_data.append(d)
                     rec[field] = new_data
         if unique:
-            seen = set()
-            unique_records = []
-            for rec in main_query.records:
-                unique_rec = distinct(rec)
-                if unique_rec in seen:
-                    continue
-                else:
-                    seen.add(unique_rec)
-                    unique_records.append(rec)
+            seen = UniqueFilter()
+            unique_records = [rec for rec in main_query.records if seen.add(rec)]
             self.records = unique_records
             self.id_map = dict([
                 (rec.id, rec)
@@ -704,16 +914,98 @@ class Query(object):
     def __iter__(self):
         return iter(tuple(self.records))
 
+    def _stream(self, model, ids, context, unique, constraints, models):
+        "run the query a chunk of ids at a time, writing the rows to `to_file`"
+        self.records = []
+        self.id_map = {}
+        self.rows = 0
+        paths = _group_paths(self.order)
+        seen = UniqueFilter()
+        with CSV(self.to_file, mode='w', stream=True, validate=False) as target:
+            for start in range(0, max(len(ids), 1), self.chunk_size):
+                # each chunk gets a private cache so memory use stays bounded
+                query = Query(
+                        model,
+                        ids=ids[start:start+self.chunk_size],
+                        domain=None,
+                        fields=self.order[:],
+                        context=context,
+                        constraints=constraints,
+                        _fetcher=QueryFetcher(models=models, cache={}),
+                        )
+                if not start:
+                    self.names = query.names
+                    self.field_defs = query.field_defs
+                    target.header = [self.names.get(p) or p for p in paths]
+                for rec in query.records:
+                    if unique and not seen.add(rec):
+                        continue
+                    for row in _flatten(rec, paths):
+                        target.append(row)
+                        self.rows += 1
+
     def __len__(self):
         return len(self.records)
 
 
+def _group_paths(paths):
+    "order `paths` so that all paths through the same linked field are adjacent"
+    groups = OrderedDict()
+    for path in paths:
+        main, _, sub = path.partition('/')
+        groups.setdefault(main, []).append(sub)
+    grouped = []
+    for main, subs in groups.items():
+        if '' in subs:
+            grouped.append(main)
+        grouped.extend([main + '/' + s for s in _group_paths([s for s in subs if s])])
+    return grouped
+
+def _flatten(record, paths):
+    """
+    return the rows (lists of values, one per path) for a Query `record`
+
+    `paths` must be grouped; each x2many link adds rows, with the values
+    of the parent record only in the first one
+    """
+    groups = OrderedDict()
+    for path in paths:
+        main, _, sub = path.partition('/')
+        groups.setdefault(main, []).append(sub)
+    blocks = []
+    for main, subs in groups.items():
+        value = None if record is None else record[main]
+        if subs == ['']:
+            blocks.append((1, [[value]]))
+            continue
+        bare = '' in subs
+        subs = [s for s in subs if s]
+        if isinstance(value, (list, tuple)):
+            targets = list(value) or [None]
+        else:
+            targets = [value or None]
+        rows = []
+        for target in targets:
+            for row in _flatten(target, subs):
+                if bare:
+                    row.insert(0, None if target is None else target.get('<self>'))
+                rows.append(row)
+        blocks.append((len(subs) + bare, rows))
+    result = []
+    for i in range(max([len(rows) for width, rows in blocks] or [1])):
+        row = []
+        for width, rows in blocks:
+            row.extend(rows[i] if i < len(rows) else [None] * width)
+        result.append(row)
+    return result
+
+
 class QueryDomain(object):
 
     _cache = dict()       # key: model.model_name, tuple(fields), tuple(ids)
     _cache_key = None
 
-    def __init__(self, model, fields, ids=None, context=None, constraints=(), _parent=None):
+    def __init__(self, model, fields, ids=None, context=None, constraints=(), _parent=None, _fetcher=None):
         # fields is the /same/ fields object from Query
         self.model = model          # OpenERP model to query
         self.fields = fields        # specific fields to gather
@@ -723,6 +1015,7 @@ class QueryDomain(object):
         self.context = context or {}
         self.constraints = constraints
         self._parent_field = _parent
+        self._fetcher = _fetcher
         self.query = None
         if any(['/' in f for f in self.fields]):
             self.query = True
@@ -736,40 +1029,176 @@ class QueryDomain(object):
             raise TypeError('run() has not been called yet')
         return self._cache_key
 
+    @property
+    def cache(self):
+        if self._fetcher is not None and self._fetcher.cache is not None:
+            return self._fetcher.cache
+        return self._cache
+
     @property
     def id_map(self):
-        return self._cache[self.cache_key][1]
+        return self.cache[self.cache_key][1]
 
     @property
     def records(self):
-        return self._cache[self.cache_key][0]
+        return self.cache[self.cache_key][0]
 
     def run(self):
-        if any(['/' in f for f in self.fields]):
-            self.query = Query(
-                    self.model,
-                    self.ids,
-                    None, # domain
-                    self.fields,
-                    None, # order
-                    self.context,
-                    _parent=self._parent_field,
-                    )
+        "read the records (Query reads its QueryDomains through its QueryFetcher instead)"
+        (self._fetcher or QueryFetcher()).read([self])
+
+    def _cached(self):
+        "True if the records are already in the cache"
         cache_key = self._cache_key = self.model.model_name, tuple(self.fields), tuple(self.ids)
-        if self._cache.get(cache_key) is None:
-            records = self.model.read(self.ids, fields=self.fields)
-            id_map = OrderedDict([
-                (r.id, r)
-                for r in records
-                if all (c(r) for c in self.constraints)
-                ])
-            # remove ids that didn't pass constraints
-            self.ids = [id for id in self.ids if id in id_map]
-            # then put records back into order of ids
-            records = [id_map[id] for id in self.ids]
-            # update cache_key as _normalize may have modified list of fields returned
-            cache_key = self._cache_key = self.model.model_name, tuple(self.fields), tuple(self.ids)
-            self._cache[cache_key] = records, id_map
+        return self.cache.get(cache_key) is not None
+
+    def _narrow(self):
+        "have the server drop records failing the constraints before they are read"
+        constraint_domain, constraints = _split_constraints(self.constraints)
+        if constraint_domain and self.ids:
+            # like read(), which the ids used to go straight to, include inactive records
+            context = dict(self.context)
+            context.setdefault('active_test', False)
+            passed = set(self.model.search(
+                    [('id','in',self.ids)] + constraint_domain,
+                    context=context,
+                    ))
+            self.ids = [id for id in self.ids if id in passed]
+
+    def _keep(self, records):
+        "save `records` (in any order) that pass the remaining constraints"
+        constraint_domain, constraints = _split_constraints(self.constraints)
+        id_map = OrderedDict([
+            (r.id, r)
+            for r in records
+            if all (c(r) for c in constraints)
+            ])
+        # remove ids that didn't pass constraints
+        self.ids = [id for id in self.ids if id in id_map]
+        # then put records back into order of ids
+        records = [id_map[id] for id in self.ids]
+        # update cache_key as _normalize may have modified list of fields returned
+        cache_key = self._cache_key = self.model.model_name, tuple(self.fields), tuple(self.ids)
+        self.cache[cache_key] = records, id_map
+
+def _split_constraints(constraints):
+    "return the domain and the callables in `constraints`"
+    domain = []
+    callables = []
+    for constraint in constraints:
+        if callable(constraint):
+            callables.append(constraint)
+        elif constraint in ('&', '|', '!'):
+            domain.append(constraint)
+        elif (
+                isinstance(constraint, (list, tuple))
+                and len(constraint) == 3
+                and isinstance(constraint[0], basestring)
+            ):
+            domain.append(tuple(constraint))
+        else:
+            raise TypeError('constraint %r is neither callable nor a domain triple' % (constraint, ))
+    return domain, callables
+
+class QueryFetcher(object):
+    """
+    reads the records of one Query execution, a level of the query tree at a time
+
+    at each level the QueryDomains that target the same model share a read of
+    the fields they need; x2many fields (which make Model.read look up the
+    linked names) are only asked for the ids of the QueryDomains that want
+    them, and records already read are not read again unless fields are missing
+
+    `models` can be shared between fetchers; a `cache` dict replaces the
+    QueryDomain cache for the queries using this fetcher
+    """
+
+    def __init__(self, models=None, cache=None):
+        self.models = {} if models is None else models  # model name -> Model
+        self.cache = cache
+        self.records = defaultdict(dict)# model name -> {id: record}
+
+    def get_model(self, connection, model_name):
+        if model_name not in self.models:
+            self.models[model_name] = connection.get_model(model_name)
+        return self.models[model_name]
+
+    def run(self, query):
+        "read the records of `query` and of all its sub-queries"
+        queries = [query]
+        domains = [query.query]
+        while domains:
+            self.read(domains)
+            next_queries = []
+            domains = []
+            for q in queries:
+                for field, sub_query in q.sub_queries.items():
+                    sub_query.ids = q._linked_ids(field)
+                    domains.append(sub_query)
+                    if isinstance(sub_query.query, Query):
+                        next_queries.append(sub_query.query)
+            queries = next_queries
+
+    def read(self, domains):
+        "fill in the records of `domains`"
+        pending = []
+        for domain in domains:
+            if not domain._cached():
+                domain._narrow()
+                pending.append(domain)
+        groups = OrderedDict()
+        for domain in pending:
+            columns = domain.model._all_columns
+            x2many = frozenset([
+                    f for f in domain.fields
+                    if columns.get(f, {}).get('type') in ('one2many', 'many2many')
+                    ])
+            groups.setdefault((domain.model.model_name, x2many), []).append(domain)
+        # reads with x2many fields first, as the ones without may then find their records
+        for (name, x2many), group in sorted(groups.items(), key=lambda item: not item[0][1]):
+            read = self.records[name]
+            fields = set()
+            ids = set()
+            for domain in group:
+                fields.update(domain.fields)
+                for id in domain.ids:
+                    rec = read.get(id)
+                    if rec is None or any(f not in rec for f in domain.fields):
+                        ids.add(id)
+            if ids:
+                records = group[0].model.read(
+                        sorted(ids),
+                        fields=sorted(fields),
+                        context=dict(group[0].context),
+                        )
+                for rec in records:
+                    if rec.id in read:
+                        # add the new fields to the earlier read
+                        known = read[rec.id]
+                        for f in fields:
+                            known[f] = rec[f]
+                    else:
+                        read[rec.id] = rec
+            for domain in group:
+                domain._keep(self._views(read, domain.ids, domain.fields))
+
+    def _views(self, read, ids, fields):
+        "copies of the `ids` records holding only `fields`"
+        views = []
+        for id in ids:
+            if id not in read:
+                # filtered out by the server
+                continue
+            rec = read[id]
+            view = AttrDict(('id', id))
+            for f in fields:
+                value = rec[f]
+                if isinstance(value, list):
+                    value = value[:]
+                view[f] = value
+            views.append(view)
+        return views
+
 
 class IDless(object):
 
@@ -910,6 +1339,193 @@ class Binary(object):
         return cls(b64decode(value))
 
 
+_csv_quoted = re.compile(r'"[^"\\]*(?:(?:""|\\.)[^"\\]*)*"\Z', re.DOTALL)
+_csv_escape = re.compile(r'""|\\(.)', re.DOTALL)
+_oe_csv_quoted = re.compile(r'"[^"]*(?:""[^"]*)*"\Z', re.DOTALL)
+
+def _csv_unescape(match):
+    ch = match.group(1)
+    if ch is None:
+        return '"'
+    elif ch == 'n':
+        return '\n'
+    return ch
+
+def _split_quoted(line):
+    """
+    break a line whose quoted fields hold no doubled quotes or escapes into
+    fields (keeping the quotes) with a handful of str.split calls
+
+    returns None unless every quote opens or closes a whole field
+    """
+    parts = line.split('"')
+    if not len(parts) % 2:
+        return None
+    # outside[i] sits between quoted fields i-1 and i
+    outside = parts[::2]
+    head = outside[0]
+    tail = outside[-1]
+    if head and head[-1] != ',' or tail and tail[0] != ',':
+        return None
+    for between in outside[1:-1]:
+        if not between or between[0] != ',' or between[-1] != ',':
+            return None
+    if ',' not in ''.join(parts[1::2]):
+        return line.split(',')
+    # hide the commas inside quotes while splitting
+    for i in range(1, len(parts), 2):
+        parts[i] = parts[i].replace(',', '\0')
+    return [f.replace('\0', ',') if '\0' in f else f for f in '"'.join(parts).split(',')]
+
+def _csv_fields(line):
+    """
+    break a CSV line into fields (quoted fields keep their quotes)
+
+    returns None for anything the fast path does not handle exactly like
+    CSV._scan_line: unterminated quotes, misplaced quotes, and quotes or
+    unbalanced parentheses outside of quoted fields
+    """
+    if '(' not in line and ')' not in line:
+        if '"' not in line:
+            return line.split(',')
+        if '\\' not in line and '""' not in line and '\0' not in line:
+            fields = _split_quoted(line)
+            if fields is not None:
+                return fields
+    fields = []
+    append = fields.append
+    pieces = iter(line.split(','))
+    for piece in pieces:
+        if '"' not in piece and '(' not in piece and ')' not in piece:
+            append(piece)
+        elif piece[:1] == '"':
+            if piece[-1] == '"' and piece.count('"') == 2 and '\\' not in piece:
+                # plain quoted string
+                append(piece)
+                continue
+            # rejoin commas inside the quotes
+            while (
+                    len(piece) < 2 or piece[-1] != '"'
+                    or _csv_quoted.match(piece) is None
+                ):
+                part = next(pieces, None)
+                if part is None:
+                    return None
+                piece += ',' + part
+            if '\\' in piece or '""' in piece:
+                piece = '"%s"' % _csv_escape.sub(_csv_unescape, piece[1:-1])
+            append(piece)
+        elif '"' in piece:
+            return None
+        else:
+            # rejoin Many2One(...) and friends
+            parens = 0
+            part = piece
+            while True:
+                if ')' not in part:
+                    parens += part.count('(')
+                elif '(' not in part:
+                    parens -= part.count(')')
+                else:
+                    for ch in part:
+                        if ch == '(':
+                            parens += 1
+                        elif ch == ')':
+                            parens -= 1
+                            if parens < 0:
+                                return None
+                if parens < 0:
+                    return None
+                elif not parens:
+                    break
+                part = next(pieces, None)
+                if part is None or '"' in part:
+                    return None
+                piece += ',' + part
+            append(piece)
+    return fields
+
+def _oe_csv_fields(line):
+    """
+    break an OpenERP csv line into fields (quoted fields keep their quotes)
+
+    returns None when OpenERPcsv._convert_line has to handle the line itself
+    (embedded newlines and malformed quoting)
+    """
+    line = line.strip()
+    if '"' not in line:
+        return line.split(',')
+    fields = []
+    append = fields.append
+    pieces = iter(line.split(','))
+    for piece in pieces:
+        if '"' not in piece:
+            append(piece)
+        elif piece[:1] != '"':
+            return None
+        elif piece[-1] == '"' and piece.count('"') == 2:
+            # plain quoted string
+            append(piece)
+        else:
+            # rejoin commas inside the quotes
+            while (
+                    len(piece) < 2 or piece[-1] != '"'
+                    or _oe_csv_quoted.match(piece) is None
+                ):
+                part = next(pieces, None)
+                if part is None:
+                    return None
+                piece += ',' + part
+            if '""' in piece:
+                piece = '"%s"' % piece[1:-1].replace('""', '"')
+            append(piece)
+    return fields
+
+
+def _parse_literal(text):
+    "convert the repr() of a Many2One or Phone back into the object"
+    try:
+        node = ast.parse(text.strip(), mode='eval').body
+    except SyntaxError:
+        raise ValueError('invalid literal: %r' % (text, ))
+    return _literal_node(node)
+
+def _literal_node(node):
+    if not isinstance(node, ast.Call):
+        return ast.literal_eval(node)
+    cls = {'Many2One': Many2One, 'Phone': Phone}.get(getattr(node.func, 'id', None))
+    if cls is None or any(k.arg is None for k in node.keywords):
+        raise ValueError('only Many2One(...) and Phone(...) are supported')
+    args = [_literal_node(a) for a in node.args]
+    kwds = dict([(k.arg, _literal_node(k.value)) for k in node.keywords])
+    return cls(*args, **kwds)
+
+
+def _parse_csv_piece(args):
+    "parse the lines between two offsets of a CSV file (runs in a worker process)"
+    filename, start, end, null, default_type, types = args
+    parser = CSV(filename, header=False, default_type=default_type, null=null, stream=True, schema=types)
+    with open(filename, 'rb') as csv:
+        csv.seek(start)
+        lines = csv.read(end - start).decode('utf-8').split('\n')
+    rows = [parser.from_csv(line) for line in [l.strip() for l in lines] if line]
+    # dbf's Date, DateTime, and Time do not survive pickling, so ship them as
+    # (row, column, class, datetime value) and let the parent rebuild them
+    moments = []
+    for r, row in enumerate(rows):
+        if any(type(v) in _dbf_plain for v in row):
+            row = list(row)
+            for c, value in enumerate(row):
+                kind = type(value)
+                if kind in _dbf_plain:
+                    moments.append((r, c, kind, value and getattr(value, _dbf_plain[kind])() or None))
+                    row[c] = None
+            rows[r] = tuple(row)
+    return rows, moments
+
+_dbf_plain = {Date: 'date', DateTime: 'datetime', Time: 'time'}
+
+
 class EmbeddedNewlineError(ValueError):
     "Embedded newline found in a quoted field"
 
@@ -924,10 +1540,15 @@ class OpenERPcsv(object):
     Note: discards first record -- make sure it is the header!"""
 
     def __init__(self, filename):
-        with open(filename) as source:
-            self.data = source.readlines()
-        self.row = 0        # skip header during iteration
-        header = self.header = self._convert_line(self.data[0])
+        self.filename = filename
+        self.source = LineReader(filename)
+        self.row = 0        # header is row 0
+        self.line = 0       # physical line the current row started on (header is line 0)
+        self._data = None
+        try:
+            header = self.header = self._convert_line(next(self.source))
+        except StopIteration:
+            raise ValueError('%s is empty' % (filename, ))
         self.types = []
         known = globals()
         for name in header:
@@ -944,18 +1565,33 @@ class OpenERPcsv(object):
             else:
                 self.types.append(None)
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
     def __iter__(self):
         return self
 
     def __next__(self):     # just plain 'next' in python 2
-        try:
-            self.row += 1
-            line = self.data[self.row]
-        except IndexError:
-            raise StopIteration
-        items = self._convert_line(line)
+        line = next(self.source)
+        self.row += 1
+        self.line = self.source.line_no - 1
+        state = None
+        while True:
+            try:
+                items = self._convert_line(line, state)
+                break
+            except EmbeddedNewlineError:
+                # quoted field continues on the next line
+                state = _sys.exc_info()[1].state
+                try:
+                    line = next(self.source)
+                except StopIteration:
+                    raise ValueError('unterminated quoted field starting on line: %d' % self.line)
         if len(self.types) != len(items):
-            raise ValueError('field/header count mismatch on line: %d' % self.row)
+            raise ValueError('field/header count mismatch on line: %d' % self.line)
         result = []
         for item, type in zip(items, self.types):
             if type is not None:
@@ -977,8 +1613,24 @@ class OpenERPcsv(object):
         return result
     next = __next__
 
+    def close(self):
+        self.source.close()
+
+    @property
+    def data(self):
+        "all lines of the file, header included; read on first use"
+        if self._data is None:
+            with open(self.filename) as source:
+                self._data = source.readlines()
+        return self._data
+
     @staticmethod
     def _convert_line(line, prev_state=None):
+        if not prev_state:
+            fields = _oe_csv_fields(line)
+            if fields is not None:
+                return fields
+        # continued or malformed line -- use the full state machine
         line = line.strip() + ','
         if prev_state:
             fields = prev_state.fields
@@ -1024,12 +1676,71 @@ class OpenERPcsv(object):
         if encap:
             word.pop()  # discard trailing comma
             if len(word) > 1:  # more than opening quote
-                word[-1] = '\\n'
+                word.append('\\n')
             current_state = AttrDict(fields=fields, word=word, encap=encap, skip_next=skip_next)
             raise EmbeddedNewlineError(state=current_state)
         return fields
 
 
+class LineReader(object):
+    """
+    iterates over the lines of filename, counting them as it goes
+
+    a missing file raises IOError unless `missing_ok`, in which case there
+    are no lines; the file is closed once exhausted, by close() or leaving
+    a with block, or when the reader is dropped part way through
+    """
+
+    def __init__(self, filename, missing_ok=False, buffering=1 << 16):
+        self.filename = filename
+        self.line_no = 0
+        try:
+            self.source = open(filename, 'r', buffering)
+        except IOError:
+            if not missing_ok:
+                raise
+            self.source = None
+            self._lines = iter(())
+        else:
+            self._lines = self._read(self.source)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):     # just plain 'next' in python 2
+        try:
+            line = next(self._lines)
+        except StopIteration:
+            self.source = None
+            raise
+        self.line_no += 1
+        return line
+    next = __next__
+
+    def close(self):
+        if self.source is not None:
+            self._lines.close()
+            # closing a generator that never started skips its finally
+            self.source.close()
+            self.source = None
+            self._lines = iter(())
+
+    @staticmethod
+    def _read(source):
+        # a generator, so the file is also closed when a reader is dropped part way through
+        try:
+            for line in source:
+                yield line
+        finally:
+            source.close()
+
+
 class SchroedingerFile(object):
     "loops through lines of filename *if it exists*; deletes file when finished"
 
@@ -1037,17 +1748,16 @@ class SchroedingerFile(object):
     ctxmgr = None
 
     def __init__(self, filename):
-        try:
-            self.data = open(filename)
+        self.data = LineReader(filename, missing_ok=True)
+        if self.data.source is not None:
             self.filename = filename
-        except IOError:
-            self.data = iter([])
 
     def __enter__(self):
         self.ctxmgr = True
         return self
 
     def __exit__(self, *args):
+        self.data.close()
         if self.filename:
             try:
                 _os.remove(self.filename)
@@ -1067,7 +1777,6 @@ class SchroedingerFile(object):
                     _os.remove(self.filename)
                 except OSError:
                     pass
-            self.data = iter([])
             raise exc
     next = __next__
 
@@ -1075,23 +1784,39 @@ class SchroedingerFile(object):
 class UpdateFile(object):
     "loops through lines of filename *if it exists* (no error if missing)"
     def __init__(self, filename):
-        try:
-            with open(filename) as source:
-                self.data = source.readlines()
-        except IOError:
-            self.data = []
+        self.filename = filename
+        self.source = LineReader(filename, missing_ok=True)
         self.row = -1
+        self._data = None
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.source.close()
+
     def __iter__(self):
         return self
 
     def __next__(self):     # just plain 'next' in python 2
-        try:
-            self.row += 1
-            return self.data[self.row]
-        except IndexError:
-            raise StopIteration
+        line = next(self.source)
+        self.row += 1
+        return line
     next = __next__
 
+    def close(self):
+        self.source.close()
+
+    @property
+    def data(self):
+        "all lines of the file ([] if missing); read on first use"
+        if self._data is None:
+            try:
+                with open(self.filename) as source:
+                    self._data = source.readlines()
+            except IOError:
+                self._data = []
+        return self._data
+
 def chunk(stream, size):
     while stream:
         chunk, stream = stream[:size], stream[size:]
@@ -1109,6 +1834,61 @@ def distinct(attr_rec):
             attr_rec[k] = v
     return IDless(attr_rec)
 
+class UniqueFilter(object):
+    """
+    tracks records by a digest of their contents, ignoring `id` and `resource_id`
+
+    like distinct() the order of x2many entries is ignored, but repeated
+    entries count; the records are not modified and only the digests are kept
+    """
+
+    skip = ('id', 'resource_id')
+
+    def __init__(self):
+        self.seen = set()
+        self._orders = {}   # record keys -> sorted keys to digest
+
+    def __contains__(self, record):
+        return self.digest(record) in self.seen
+
+    def __len__(self):
+        return len(self.seen)
+
+    def add(self, record):
+        "remember `record`; return True if it had not been seen before"
+        digest = self.digest(record)
+        if digest in self.seen:
+            return False
+        self.seen.add(digest)
+        return True
+
+    def digest(self, value):
+        if isinstance(value, (AttrDict, dict)):
+            keys = tuple(value.keys())
+            order = self._orders.get(keys)
+            if order is None:
+                order = self._orders[keys] = [
+                        (k, k.encode('utf-8'))
+                        for k in sorted(keys)
+                        if k not in self.skip
+                        ]
+            digest = sha1(b'{')
+            for key, encoded in order:
+                digest.update(encoded)
+                digest.update(b':')
+                digest.update(self.digest(value[key]))
+                digest.update(b',')
+            return digest.digest()
+        elif isinstance(value, IDEquality):
+            # before tuples, as a Many2One is one
+            return ('#%r' % (value.id, )).encode('utf-8')
+        elif isinstance(value, (list, tuple)):
+            # order does not matter, repeats do
+            return sha1(b'[' + b','.join(sorted([self.digest(v) for v in value])) + b']').digest()
+        else:
+            return repr(value).encode('utf-8')
+
+
 def PropertyNames(cls):
     for name, thing in cls.__dict__.items():
         if (
@@ -1152,22 +1932,23 @@ class SetOnce(object):
 
 normalize_phone = translator(frm='X#', to='x', keep=u'01234567890x')
 
-class Phone(object):
-    """
-    give some smarts to phone equality, plus extension separation
-    """
-
-    def __init__(self, number, ext=''):
-        self._number = ''
-        self._base = ''
-        self._ext = ''
-        if not (number or ext):
-            return
-        data = normalize_phone(unicode(number)) # normalize number
-        ext = normalize_phone(ext)
-        if not (data.strip('0') or ext):
-            # no number, we're done
-            return
+def _phone_number(number):
+    "what Phone(number).number would be"
+    if not number:
+        return ''
+    return _phone_parts(unicode(number), '')[2]
+
+def _phone_parts(number, ext):
+    "(base, ext, number) of Phone(number, ext), remembered for next time"
+    key = number, ext
+    try:
+        return _phone_cache[key]
+    except KeyError:
+        pass
+    base = number = ''
+    data = normalize_phone(key[0]) # normalize number
+    ext = normalize_phone(ext)
+    if data.strip('0') or ext:
         # fix double leading zeros
         if data[:2] == '00':
             data = '011' + data[2:]
@@ -1176,7 +1957,7 @@ class Phone(object):
             data = '011' + data[1:].replace('+', '')
         if 'x' in data:
             if ext:
-                raise ValueError("extension in 'number' and 'ext' specified: %r" % ((number, ext), ))
+                raise ValueError("extension in 'number' and 'ext' specified: %r" % (key, ))
             data, ext = data.split('x', 1)
             data = data.strip()
             ext = ext.strip()
@@ -1207,28 +1988,40 @@ class Phone(object):
                     post.append(data[-3:])
                     data = data[:-3]
             post.reverse()
-            self._base = '.'.join(pre + post)
-            self._ext = ext
-            self._number = ('%s %s' % (self._base, self._ext)).strip()
+            base = '.'.join(pre + post)
         elif len(data) not in (7, 10):
-            self._base = data
-            self._ext = ext
-            self._number = ('%s %s' % (self._base, self._ext)).strip()
+            base = data
         elif len(data) == 10:
             if data[0] == '1':
                 data = data[1:]
-            self._base = '%s.%s.%s' % (data[:3], data[3:6], data[6:])
-            self._ext = ext
-            self._number = ('%s %s' % (self._base, self._ext)).strip()
+            base = '%s.%s.%s' % (data[:3], data[3:6], data[6:])
         elif len(data) == 7:
-            self._base = '%s.%s' % (data[:3], data[3:])
-            self._ext = ext
-            self._number = ('%s %s' % (self._base, self._ext)).strip()
+            base = '%s.%s' % (data[:3], data[3:])
+        number = ('%s %s' % (base, ext)).strip()
+    else:
+        ext = ''
+    if len(_phone_cache) >= 10000:
+        _phone_cache.clear()
+    _phone_cache[key] = parts = base, ext, number
+    return parts
+
+_phone_cache = {}
+
+class Phone(object):
+    """
+    give some smarts to phone equality, plus extension separation
+    """
+
+    def __init__(self, number, ext=''):
+        if not (number or ext):
+            self._base = self._ext = self._number = ''
+            return
+        self._base, self._ext, self._number = _phone_parts(unicode(number), ext)
 
     def __eq__(self, other):
         if not isinstance(other, self.__class__):
             try:
-                other = self.__class__(other)
+                return self._number == _phone_number(other)
             except AttributeError:
                 return NotImplemented
         return self._number == other.number
@@ -1236,11 +2029,18 @@ class Phone(object):
     def __ne__(self, other):
         if not isinstance(other, self.__class__):
             try:
-                other = self.__class__(other)
+                return self._number != _phone_number(other)
             except AttributeError:
                 return NotImplemented
         return self._number != other.number
 
+    @staticmethod
+    def normalize_many(numbers):
+        """
+        return the normalized form (what .number would be) of each of `numbers`
+        """
+        return [_phone_number(n) for n in numbers]
+
     def __hash__(self):
         return hash(self._number)
 
@@ -1279,9 +2079,24 @@ class Phone(object):
 class CSV(object):
     """
     represents a .csv file
+
+    with `stream` the file is not loaded: rows are read from disk as they are
+    iterated over, and an index of line offsets is only built if `len()` or
+    indexing is used; touching `data` (or appending) loads the lines, after
+    which the file behaves as if read without `stream`, and save() writes it
+
+    `schema` gives the type of each column (a list, or a dict keyed by header
+    name; None entries are sniffed per value) so each value is converted
+    directly; with `schema=True` the types are inferred from the first
+    `sample` rows -- values that do not fit their column are still sniffed
+
+    in write mode `stream` writes each row to the file as it is appended
+    (the header, if any, must be set before the first row); `validate` is
+    True to check every row by parsing it back, False to never check, or n
+    to check every nth row
     """
 
-    def __init__(self, filename, mode='r', header=True, default_type=None, null=None):
+    def __init__(self, filename, mode='r', header=True, default_type=None, null=None, stream=False, schema=None, sample=100, validate=True):
         if mode not in ('r','w'):
             raise ValueError("mode must be 'r' or 'w', not %r" % (mode, ))
         self.filename = filename
@@ -1289,29 +2104,67 @@ class CSV(object):
         self.default_type = default_type
         self.null = null
         self.use_header = header
-        if mode == 'r':
+        self.stream = stream
+        self.validate = validate
+        self._offsets = None
+        self._target = None
+        self._written = 0
+        self._appended = 0
+        if mode == 'r' and stream:
+            self.header = []
+            self._data = None
+            if header:
+                with open(filename, 'rb') as csv:
+                    self.header = csv.readline().decode('utf-8').strip().split(',')
+        elif mode == 'r':
             with codecs.open(filename, mode='r', encoding='utf-8') as csv:
                 raw_data = csv.read().split('\n')
             if header:
                 self.header = raw_data.pop(0).strip().split(',')
             else:
                 self.header = []
-            self.data = [l.strip() for l in raw_data if l.strip()]
+            self._data = [l.strip() for l in raw_data if l.strip()]
+        elif stream:
+            self.header = []
+            self._data = None
+            self._target = io.open(filename, mode='w', encoding='utf-8', newline='', buffering=1 << 16)
         else:
             self.header = []
-            self.data = []
+            self._data = []
         if not header:
             self.header = []
-
+        self._literals = {}
+        self.types = None
+        self._converters = None
+        if schema is True:
+            if mode == 'r':
+                self.types = self._infer(sample)
+        elif isinstance(schema, dict):
+            if not self.header:
+                raise ValueError('header needed for a schema by column name')
+            self.types = [schema.get(name) for name in self.header]
+        elif schema is not None:
+            self.types = list(schema)
+        if self.types is not None:
+            self._converters = [self._converter(t) for t in self.types]
 
     def __enter__(self):
         return self
 
     def __exit__(self, *args):
-        if args == (None, None, None) and self.mode == 'w':
+        if self._target is not None:
+            # rows are already on disk
+            self.close()
+        elif args == (None, None, None) and self.mode == 'w':
             self.save()
 
     def __getitem__(self, index):
+        if self._streaming():
+            offsets = self._index()
+            with open(self.filename, 'rb') as source:
+                if isinstance(index, int):
+                    return self.from_csv(self._read_at(source, offsets[index]))
+                return [self.from_csv(self._read_at(source, o)) for o in offsets[index]]
         if isinstance(index, int):
             return self.from_csv(self.data[index])
         # better be a slice
@@ -1324,26 +2177,108 @@ class CSV(object):
         """
         returns data rows (not header)
         """
-        for line in self.data:
+        if self._streaming():
+            lines = (line for offset, line in self._lines())
+        else:
+            lines = self.data
+        for line in lines:
             yield self.from_csv(line)
 
     def __len__(self):
+        if self._streaming():
+            return len(self._index())
+        elif self.stream and self.mode == 'w':
+            return self._written
         return len(self.data)
 
+    def _streaming(self):
+        "True while rows are read from disk (a streamed file whose data has not been loaded)"
+        return self.stream and self.mode == 'r' and self._data is None
+
+    @property
+    def data(self):
+        "the data lines (not header); read from disk on first use when streaming"
+        if self._data is None and self.stream and self.mode == 'r':
+            self._data = [line for offset, line in self._lines()]
+        return self._data
+
+    @data.setter
+    def data(self, lines):
+        self._data = lines
+
+    def _index(self):
+        "offsets of the data lines, built on first use"
+        if self._offsets is None:
+            self._offsets = array(_OFFSET_CODE, [offset for offset, line in self._lines()])
+        return self._offsets
+
+    def _lines(self):
+        "yield (offset, stripped line) for each non-blank data line"
+        with open(self.filename, 'rb') as csv:
+            offset = 0
+            if self.use_header:
+                offset += len(csv.readline())
+            for line in csv:
+                start, offset = offset, offset + len(line)
+                line = line.decode('utf-8').strip()
+                if line:
+                    yield start, line
+
+    @staticmethod
+    def _read_at(source, offset):
+        source.seek(int(offset))
+        return source.readline().decode('utf-8').strip()
+
     def append(self, *values):
-        if isinstance(values[0], (list, tuple)):
+        if isinstance(values[0], (AttrDict, dict)):
+            values = self._from_map(values[0])
+        elif isinstance(values[0], (list, tuple)):
             values = tuple(values[0])
         if self.header and len(values) != len(self.header):
             raise ValueError('%d fields required, %d value(s) given' % (len(self.header), len(values)))
         line = self.to_csv(*values)
-        new_values = self.from_csv(line)
-        if values != new_values:
-            echo(len(values), len(new_values))
-            echo(line)
-            echo(values)
-            echo(new_values)
-            raise ValueError
-        self.data.append(line)
+        self._appended += 1
+        validate = self.validate
+        if validate is True or validate and not self._appended % validate:
+            new_values = self.from_csv(line)
+            if values != new_values:
+                echo(len(values), len(new_values))
+                echo(line)
+                echo(values)
+                echo(new_values)
+                raise ValueError
+        if self._target is not None:
+            self._write(line)
+        else:
+            self.data.append(line)
+
+    def close(self):
+        "finish writing a streamed file"
+        if self._target is not None:
+            if not self._written and self.header:
+                self._write(None)
+            self._target.close()
+            self._target = None
+
+    def extend(self, rows):
+        "append each row (a sequence, or a mapping of header names to values)"
+        for row in rows:
+            self.append(row)
+
+    def _from_map(self, record):
+        if not self.header:
+            if self._written or self.data:
+                raise ValueError('header needed to append mappings')
+            self.header = list(record.keys())
+        return tuple([record[name] for name in self.header])
+
+    def _write(self, line):
+        target = self._target
+        if not self._written and self.header:
+            target.write(','.join(self.header) + '\n')
+        if line is not None:
+            target.write(line + '\n')
+            self._written += 1
 
     def from_csv(self, line):
         """
@@ -1360,6 +2295,133 @@ class CSV(object):
         unicode     : "anything else"
         """
         # break line into fields
+        fields = _csv_fields(line)
+        if fields is None:
+            # malformed line -- let the state machine report the problem
+            fields = self._scan_line(line)
+        #
+        # convert fields to their data types
+        converters = self._converters
+        if converters is None:
+            return tuple([self._sniff(field) for field in fields])
+        if len(fields) > len(converters):
+            converters = converters + [self._sniff] * (len(fields) - len(converters))
+        return tuple([convert(field) for convert, field in zip(converters, fields)])
+
+    def _sniff(self, field):
+        "convert `field` to whatever type it looks like"
+        try:
+            if not field:
+                return self.null
+            elif field[0] == field[-1] == '"':
+                # simple string
+                return field[1:-1]
+            elif field.lower() in ('true','yes','on','t'):
+                return True
+            elif field.lower() in ('false','no','off','f'):
+                return False
+            elif 'Many2One' in field or 'Phone' in field:
+                return self._literal(field)
+            elif '-' in field and ':' in field:
+                return dates.str_to_datetime(field, localtime=False)
+            elif '-' in field:
+                return dates.str_to_date(field)
+            elif ':' in field:
+                return dates.str_to_time(field, localtime=False)
+            else:
+                try:
+                    return int(field)
+                except ValueError:
+                    return float(field)
+        except ValueError:
+            if self.default_type is not None:
+                return self.default_type(field)
+            else:
+                ve = ValueError('unable to determine datatype of <%r>' % (field, ))
+                ve.__cause__ = None
+                raise ve
+
+    def _literal(self, field):
+        "Many2One and Phone values, without eval()"
+        if field in self._literals:
+            return self._literals[field]
+        value = _parse_literal(field)
+        if isinstance(value, Many2One):
+            # immutable, so safe to share
+            if len(self._literals) > 10000:
+                self._literals.clear()
+            self._literals[field] = value
+        return value
+
+    def _infer(self, sample):
+        "return the type of each column as found in the first `sample` rows"
+        if self.stream:
+            lines = islice((line for offset, line in self._lines()), sample)
+        else:
+            lines = self.data[:sample]
+        found = []
+        for line in lines:
+            fields = _csv_fields(line)
+            if fields is None:
+                fields = self._scan_line(line)
+            while len(found) < len(fields):
+                found.append(set())
+            for kinds, field in zip(found, fields):
+                value = self._sniff(field)
+                if value is not self.null:
+                    kinds.add(type(value))
+        types = []
+        for kinds in found:
+            if kinds == set([int, float]):
+                kinds = set([float])
+            types.append(kinds.pop() if len(kinds) == 1 else None)
+        return types
+
+    def _converter(self, kind):
+        "return a function converting a field to `kind` (sniffing what does not fit)"
+        if kind is None:
+            return self._sniff
+        elif kind in (str, unicode):
+            def parse(field):
+                if field[0] == field[-1] == '"':
+                    return field[1:-1]
+                raise ValueError
+        elif kind is bool:
+            words = {
+                    'true': True, 'yes': True, 'on': True, 't': True,
+                    'false': False, 'no': False, 'off': False, 'f': False,
+                    }
+            def parse(field):
+                try:
+                    return words[field.lower()]
+                except KeyError:
+                    raise ValueError
+        elif kind in (int, float):
+            parse = kind
+        elif kind in dates.datetimes:
+            parse = lambda field: dates.str_to_datetime(field, localtime=False)
+        elif kind in dates.dates:
+            parse = dates.str_to_date
+        elif kind in dates.times:
+            parse = lambda field: dates.str_to_time(field, localtime=False)
+        elif kind in (Many2One, Phone):
+            parse = self._literal
+        else:
+            raise TypeError('unsupported column type: %r' % (kind, ))
+        null = self.null
+        sniff = self._sniff
+        def convert(field):
+            if not field:
+                return null
+            try:
+                return parse(field)
+            except ValueError:
+                return sniff(field)
+        return convert
+
+    @staticmethod
+    def _scan_line(line):
+        "break `line` into fields one character at a time"
         fields = []
         word = []
         encap = False
@@ -1417,43 +2479,54 @@ class CSV(object):
             raise ValueError('unbalanced parentheses in:\n%r' % line)
         # don't lose last field!
         fields.append(''.join(word))
-        #
-        # convert fields to their data types
-        final = []
-        for i, field in enumerate(fields):
-            try:
-                if not field:
-                    final.append(self.null)
-                elif field[0] == field[-1] == '"':
-                    # simple string
-                    final.append(field[1:-1])
-                elif field.lower() in ('true','yes','on','t'):
-                    final.append(True)
-                elif field.lower() in ('false','no','off','f'):
-                    final.append(False)
-                elif '-' in field and ':' in field:
-                    final.append(dates.str_to_datetime(field, localtime=False))
-                elif '-' in field:
-                    final.append(Date.strptime(field, '%Y-%m-%d'))
-                elif ':' in field:
-                    final.append(Time.strptime(field, '%H:%M:%S'))
-                elif 'Many2One' in field:
-                    final.append(eval(field))
-                elif 'Phone' in field:
-                    final.append(eval(field))
-                else:
-                    try:
-                        final.append(int(field))
-                    except ValueError:
-                        final.append(float(field))
-            except ValueError:
-                if self.default_type is not None:
-                    final.append(self.default_type(field))
-                else:
-                    ve = ValueError('unable to determine datatype of <%r>' % (field, ))
-                    ve.__cause__ = None
-                    raise ve
-        return tuple(final)
+        return fields
+
+    def iter_parallel(self, processes=None, chunk_size=1 << 22):
+        """
+        returns data rows (not header), parsed by a pool of `processes`
+
+        the file is cut into pieces of about `chunk_size` bytes at line ends
+        (newlines inside values are always written as \\n, so every line is
+        a whole row); rows come back in file order, and only a few pieces are
+        in flight at a time; `default_type`, if used, must be picklable
+        """
+        if self.mode != 'r':
+            raise ValueError('iter_parallel() needs a file opened for reading')
+        pool = multiprocessing.Pool(processes)
+        try:
+            window = 2 * (processes or multiprocessing.cpu_count())
+            pieces = iter(self._pieces(chunk_size))
+            pending = deque([
+                    pool.apply_async(_parse_csv_piece, (piece, ))
+                    for piece in islice(pieces, window)
+                    ])
+            while pending:
+                rows, moments = pending.popleft().get()
+                if moments:
+                    rows = [list(row) for row in rows]
+                    for r, c, kind, value in moments:
+                        rows[r][c] = kind(value)
+                    rows = [tuple(row) for row in rows]
+                for piece in islice(pieces, 1):
+                    pending.append(pool.apply_async(_parse_csv_piece, (piece, )))
+                for row in rows:
+                    yield row
+        finally:
+            pool.terminate()
+            pool.join()
+
+    def _pieces(self, chunk_size):
+        "yield the arguments for _parse_csv_piece, one per piece of the file"
+        with open(self.filename, 'rb') as csv:
+            start = len(csv.readline()) if self.use_header else 0
+            csv.seek(0, _os.SEEK_END)
+            size = csv.tell()
+            while start < size:
+                csv.seek(min(start + chunk_size, size))
+                csv.readline()
+                end = csv.tell()
+                yield self.filename, start, end, self.null, self.default_type, self.types
+                start = end
 
     def iter_map(self, header=None):
         header = self.header or header
@@ -1463,6 +2536,11 @@ class CSV(object):
             yield AttrDict(zip(self.header, record))
 
     def save(self, filename=None):
+        if self.stream and self.mode == 'w':
+            if filename not in (None, self.filename):
+                raise ValueError('a streamed file can only be saved to %r' % (self.filename, ))
+            self.close()
+            return
         if filename is None:
             filename = self.filename
         with codecs.open(filename, mode='w', encoding='utf-8') as csv:
@@ -1472,6 +2550,8 @@ class CSV(object):
             # write the data
             for line in self.data:
                 csv.write(line + '\n')
+        if filename == self.filename:
+            self._offsets = None
 
     def to_csv(self, *data):
         """
@@ -1560,7 +2640,9 @@ class SelectionEnum(str, _aenum.Enum):
             return NotImplemented
 
     def __getitem__(self, index):
-        return list(self)[index]
+        if isinstance(index, slice):
+            return list(self._value_[index])
+        return self._value_[index]
 
     def __iter__(self):
         "return db value, user value"
@@ -1573,26 +2655,37 @@ class SelectionEnum(str, _aenum.Enum):
     def _generate_next_value_(name, start, count, values, *args, **kwds):
         return (name, ) + args
 
+    @classmethod
+    def _member_index(cls):
+        "(members in order, {db value: member}), made on first use"
+        index = cls.__dict__.get('_by_position_and_db')
+        if index is None:
+            members = list(cls)
+            by_db = {}
+            for member in members:
+                by_db.setdefault(member.db, member)
+            index = cls._by_position_and_db = members, by_db
+        return index
+
     @classmethod
     def _missing_name_(cls, index):
         "supports list-type indexing"
-        return list(cls)[index]
+        return cls._member_index()[0][index]
 
     @classmethod
     def _missing_value_(cls, value):
         "support look-up by db name"
-        for member in cls:
-            if member.db == value:
-                return member
+        try:
+            return cls._member_index()[1].get(value)
+        except TypeError:
+            # unhashable
+            return None
 
     @classmethod
     def get_member(cls, text, default=_raise_lookup):
-        for member in cls:
-            if member.db == text:
-                return member
-            elif default == _raise_lookup and member.db == default:
-                default = member
-        else:
+        try:
+            return cls._member_index()[1][text]
+        except (KeyError, TypeError):
             if default is not _raise_lookup:
                 return default
         raise LookupError('%r not found in %s' % (text, cls.__name__))